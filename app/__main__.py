@@ -0,0 +1,63 @@
+"""Servidor de producción de la API.
+
+    python -m app --workers 4 --loop uvloop --http httptools --keep-alive 5
+
+Cada opción tiene su variable de entorno (ver `app/core/config.py`); la línea
+de comandos tiene prioridad. Antes de lanzar los workers se vacía la cache
+compartida (`app/core/shared_cache.py`) para no servir datos de una ejecución
+anterior.
+"""
+import argparse
+import logging
+
+import uvicorn
+
+from app.core.config import (
+    SERVER_HOST,
+    SERVER_PORT,
+    SERVER_WORKERS,
+    SERVER_LOOP,
+    SERVER_HTTP,
+    SERVER_KEEPALIVE_SECONDS,
+    SERVER_BACKLOG,
+)
+from app.core.shared_cache import reset_shared_cache
+
+logger = logging.getLogger("app")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m app", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS, help="Worker processes (default: WEB_CONCURRENCY or the CPUs this process may run on).")
+    parser.add_argument("--loop", default=SERVER_LOOP, choices=["auto", "uvloop", "asyncio"])
+    parser.add_argument("--http", default=SERVER_HTTP, choices=["auto", "httptools", "h11"])
+    parser.add_argument("--keep-alive", type=int, default=SERVER_KEEPALIVE_SECONDS, help="Seconds to keep idle connections open.")
+    parser.add_argument("--backlog", type=int, default=SERVER_BACKLOG)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    try:
+        reset_shared_cache()
+    except OSError as e:
+        # Cada worker vuelve a intentarlo y, si falla, sigue sin cache
+        logger.warning(f"Could not reset shared cache: {e}")
+
+    uvicorn.run(
+        "app.main:app",
+        host=args.host,
+        port=args.port,
+        workers=max(args.workers, 1),
+        loop=args.loop,
+        http=args.http,
+        timeout_keep_alive=args.keep_alive,
+        backlog=args.backlog,
+        log_level=args.log_level,
+        # Detrás del proxy de la plataforma: respetar X-Forwarded-For/Proto
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
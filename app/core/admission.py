@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import math
+import re
+from collections import deque
+from typing import Dict, Iterable
+
+from fastapi.responses import JSONResponse
+
+from .config import (
+    ADMISSION_CHEAP_MAX_IN_FLIGHT,
+    ADMISSION_CHEAP_MAX_QUEUE,
+    ADMISSION_EXPENSIVE_MAX_IN_FLIGHT,
+    ADMISSION_EXPENSIVE_MAX_QUEUE,
+    ADMISSION_QUEUE_TIMEOUT_SECONDS,
+    ADMISSION_PER_TOKEN_MAX_IN_FLIGHT,
+)
+
+logger = logging.getLogger(__name__)
+
+# Rutas caras: listados, búsqueda de similares, exportaciones y operaciones masivas
+EXPENSIVE_ROUTES = [
+    re.compile(r"^/patients/?$"),
+    re.compile(r"^/patients/summary/?$"),
+    re.compile(r"^/clinical_histories/document/[^/]+/?$"),
+    re.compile(r"/(export|bulk)(/|$)"),
+    re.compile(r"/similar/?$"),
+]
+
+# Solo se controla la admisión de las rutas de la API
+PROTECTED_PREFIXES = ("/patients", "/clinical_histories")
+
+
+class ConcurrencyBudget:
+    """Límite de peticiones en curso con una cola de espera acotada (FIFO)."""
+
+    def __init__(self, name: str, max_in_flight: int, max_queue: int):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self, timeout: float) -> bool:
+        """Intenta obtener un hueco esperando como mucho `timeout` segundos."""
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            return True
+        if len(self._waiters) >= self.max_queue:
+            return False
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+            return True
+        except asyncio.TimeoutError:
+            if waiter.done():
+                # El hueco llegó justo al vencer el plazo: lo conservamos
+                return True
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            return False
+        except asyncio.CancelledError:
+            if waiter.done():
+                self.release()
+            else:
+                waiter.cancel()
+                self._waiters.remove(waiter)
+            raise
+
+    def release(self) -> None:
+        # El hueco se transfiere directamente al primer waiter vivo de la cola
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+
+def _retry_after(seconds: float) -> str:
+    return str(max(math.ceil(seconds), 1))
+
+
+class AdmissionControlMiddleware:
+    """Middleware ASGI de control de admisión.
+
+    Cada petición a la API debe obtener un hueco de su token (límite por
+    integración, 429 si se supera) y del presupuesto de su tipo de ruta
+    (lecturas puntuales baratas o listados caros). Si el presupuesto está
+    lleno, la petición espera en una cola acotada hasta
+    `queue_timeout` segundos y, si no entra, se descarta con 503.
+    """
+
+    def __init__(
+        self,
+        app,
+        cheap_max_in_flight: int = ADMISSION_CHEAP_MAX_IN_FLIGHT,
+        cheap_max_queue: int = ADMISSION_CHEAP_MAX_QUEUE,
+        expensive_max_in_flight: int = ADMISSION_EXPENSIVE_MAX_IN_FLIGHT,
+        expensive_max_queue: int = ADMISSION_EXPENSIVE_MAX_QUEUE,
+        queue_timeout: float = ADMISSION_QUEUE_TIMEOUT_SECONDS,
+        per_token_max_in_flight: int = ADMISSION_PER_TOKEN_MAX_IN_FLIGHT,
+        protected_prefixes: Iterable[str] = PROTECTED_PREFIXES,
+    ):
+        self.app = app
+        self.cheap = ConcurrencyBudget("cheap", cheap_max_in_flight, cheap_max_queue)
+        self.expensive = ConcurrencyBudget("expensive", expensive_max_in_flight, expensive_max_queue)
+        self.queue_timeout = queue_timeout
+        self.per_token_max_in_flight = per_token_max_in_flight
+        self.protected_prefixes = tuple(protected_prefixes)
+        self._token_in_flight: Dict[str, int] = {}
+
+    def _budget_for(self, path: str) -> ConcurrencyBudget:
+        if any(pattern.search(path) for pattern in EXPENSIVE_ROUTES):
+            return self.expensive
+        return self.cheap
+
+    @staticmethod
+    def _client_key(scope) -> str:
+        for name, value in scope.get("headers", []):
+            if name == b"authorization":
+                return value.decode("latin-1")
+        client = scope.get("client")
+        return f"anonymous:{client[0]}" if client else "anonymous"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.protected_prefixes):
+            await self.app(scope, receive, send)
+            return
+
+        key = self._client_key(scope)
+        if self._token_in_flight.get(key, 0) >= self.per_token_max_in_flight:
+            response = JSONResponse(
+                {"detail": "Too many concurrent requests for this token"},
+                status_code=429,
+                headers={"Retry-After": _retry_after(self.queue_timeout)},
+            )
+            await response(scope, receive, send)
+            return
+
+        self._token_in_flight[key] = self._token_in_flight.get(key, 0) + 1
+        try:
+            budget = self._budget_for(scope["path"])
+            if not await budget.acquire(self.queue_timeout):
+                logger.warning(
+                    f"Shedding {scope['method']} {scope['path']} "
+                    f"({budget.name}: {budget.in_flight} in flight, {budget.queued} queued)"
+                )
+                response = JSONResponse(
+                    {"detail": "Server overloaded, retry later"},
+                    status_code=503,
+                    headers={"Retry-After": _retry_after(self.queue_timeout)},
+                )
+                await response(scope, receive, send)
+                return
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                budget.release()
+        finally:
+            remaining = self._token_in_flight[key] - 1
+            if remaining:
+                self._token_in_flight[key] = remaining
+            else:
+                del self._token_in_flight[key]
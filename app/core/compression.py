@@ -0,0 +1,267 @@
+import logging
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional
+
+import anyio
+
+from .config import (
+    COMPRESSION_ENCODINGS,
+    COMPRESSION_MIN_SIZE,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_BROTLI_QUALITY,
+    COMPRESSION_ZSTD_LEVEL,
+)
+
+# brotli y zstandard son opcionales: sin ellos solo se negocia gzip
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Solo se comprimen formatos de texto; imágenes, PDFs, etc. ya van comprimidos
+COMPRESSIBLE_TYPES = ("text/", "application/json", "application/javascript", "application/xml")
+# Bloques grandes se comprimen en el threadpool para no frenar el event loop
+# (zlib, brotli y zstd liberan el GIL)
+THREADPOOL_MIN_SIZE = 64 * 1024
+
+
+class _Compressor(ABC):
+    """Interfaz común: `compress` devuelve lo que ya se puede enviar y `finish` el resto."""
+
+    @abstractmethod
+    def compress(self, data: bytes) -> bytes:
+        """Comprime `data`; puede devolver b"" si el códec aún acumula."""
+
+    @abstractmethod
+    def flush(self) -> bytes:
+        """Vacía lo pendiente para que el cliente pueda descomprimir lo recibido hasta ahora."""
+
+    @abstractmethod
+    def finish(self) -> bytes:
+        """Cierra el flujo comprimido."""
+
+
+class _GzipCompressor(_Compressor):
+    def __init__(self):
+        # wbits=31: formato gzip (cabecera y CRC) en lugar de zlib puro
+        self._obj = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zlib.Z_FINISH)
+
+
+class _BrotliCompressor(_Compressor):
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=COMPRESSION_BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+class _ZstdCompressor(_Compressor):
+    def __init__(self):
+        self._obj = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.compress(data)
+
+    def flush(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_FINISH)
+
+
+def available_encodings() -> Dict[str, Callable[[], _Compressor]]:
+    """Codificaciones soportadas en este entorno, en el orden de preferencia configurado."""
+    factories = {"gzip": _GzipCompressor}
+    if brotli is not None:
+        factories["br"] = _BrotliCompressor
+    if zstandard is not None:
+        factories["zstd"] = _ZstdCompressor
+    encodings = {}
+    for name in COMPRESSION_ENCODINGS:
+        if name in factories:
+            encodings[name] = factories[name]
+        else:
+            logger.warning(f"Compression encoding {name!r} is not available and will not be negotiated")
+    return encodings
+
+
+def negotiate(accept_encoding: str, supported: List[str]) -> Optional[str]:
+    """Elige la codificación según `Accept-Encoding` (RFC 9110).
+
+    Gana el mayor q; a igualdad, el orden de `supported`. `*` cubre las que no
+    aparecen explícitamente y q=0 las excluye.
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _header(headers: List, name: bytes) -> Optional[bytes]:
+    for key, value in headers:
+        if key.lower() == name:
+            return value
+    return None
+
+
+def _with_vary(headers: List) -> List:
+    """Cabeceras con `Accept-Encoding` añadido a `Vary` (conservando lo que ya tuviera)."""
+    values = [
+        v.strip()
+        for key, value in headers if key.lower() == b"vary"
+        for v in value.decode("latin-1").split(",") if v.strip()
+    ]
+    if "accept-encoding" not in (v.lower() for v in values):
+        values.append("Accept-Encoding")
+    return [(k, v) for k, v in headers if k.lower() != b"vary"] + [(b"vary", ", ".join(values).encode("latin-1"))]
+
+
+class CompressionMiddleware:
+    """Middleware ASGI que comprime las respuestas con gzip, brotli o zstd según `Accept-Encoding`.
+
+    Las respuestas de menos de `COMPRESSION_MIN_SIZE` bytes se envían tal cual.
+    Toda respuesta de un tipo comprimible lleva `Vary: Accept-Encoding`, se
+    comprima o no, para que una cache no sirva la versión comprimida a un
+    cliente que no la acepta. Con respuestas en streaming se acumulan los primeros bloques hasta superar
+    el umbral y a partir de ahí cada bloque se comprime y se vacía (flush) al
+    momento, sin esperar al final del cuerpo.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.encodings = available_encodings()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = None
+        accept_encoding = _header(scope["headers"], b"accept-encoding")
+        # HEAD no lleva cuerpo que comprimir, pero sí las mismas cabeceras (Vary) que GET
+        if accept_encoding and scope["method"] != "HEAD":
+            encoding = negotiate(accept_encoding.decode("latin-1"), list(self.encodings))
+        factory = self.encodings[encoding] if encoding else None
+        await _CompressedResponse(self.app, encoding, factory, self.minimum_size)(scope, receive, send)
+
+
+class _CompressedResponse:
+    def __init__(self, app, encoding: Optional[str], factory: Optional[Callable[[], _Compressor]], minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.factory = factory
+        self.minimum_size = minimum_size
+        self.start_message = None
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.compressor: Optional[_Compressor] = None
+        # None: aún no se sabe; False: la respuesta pasa sin comprimir
+        self.compress = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_wrapper)
+
+    async def send_wrapper(self, message):
+        if message["type"] == "http.response.start":
+            headers = message.get("headers", [])
+            content_type = (_header(headers, b"content-type") or b"").decode("latin-1")
+            compressible = _header(headers, b"content-encoding") is None and content_type.startswith(COMPRESSIBLE_TYPES)
+            self.compress = compressible and self.factory is not None and message["status"] not in (204, 304)
+            if not self.compress:
+                if compressible:
+                    message = {**message, "headers": _with_vary(headers)}
+                await self.send(message)
+            else:
+                # Se retiene hasta saber si el cuerpo supera el umbral
+                self.start_message = message
+            return
+
+        if message["type"] != "http.response.body" or not self.compress:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None:
+            self.buffer.append(body)
+            self.buffered += len(body)
+            if self.buffered < self.minimum_size:
+                if more_body:
+                    return
+                # Respuesta pequeña: se envía sin comprimir
+                await self._start(compressed=False, length=self.buffered)
+                await self.send({"type": "http.response.body", "body": b"".join(self.buffer)})
+                return
+            body, self.buffer = b"".join(self.buffer), []
+            self.compressor = self.factory()
+            if not more_body:
+                # Caso habitual (JSONResponse): todo el cuerpo en un mensaje
+                data = await self._run(lambda: self.compressor.compress(body) + self.compressor.finish(), len(body))
+                await self._start(compressed=True, length=len(data))
+                await self.send({"type": "http.response.body", "body": data})
+                return
+            await self._start(compressed=True, length=None)
+
+        if more_body:
+            data = await self._run(lambda: self.compressor.compress(body) + self.compressor.flush(), len(body))
+        else:
+            data = await self._run(lambda: self.compressor.compress(body) + self.compressor.finish(), len(body))
+        if data or not more_body:
+            await self.send({"type": "http.response.body", "body": data, "more_body": more_body})
+
+    async def _run(self, func: Callable[[], bytes], size: int) -> bytes:
+        if size >= THREADPOOL_MIN_SIZE:
+            return await anyio.to_thread.run_sync(func)
+        return func()
+
+    async def _start(self, compressed: bool, length: Optional[int]) -> None:
+        message = self.start_message
+        headers = _with_vary([(k, v) for k, v in message.get("headers", []) if k.lower() != b"content-length"])
+        if compressed:
+            headers.append((b"content-encoding", self.encoding.encode("latin-1")))
+        if length is not None:
+            headers.append((b"content-length", str(length).encode("latin-1")))
+        await self.send({**message, "headers": headers})
@@ -1,4 +1,5 @@
 import os
+import tempfile
 
 # Ruta del archivo .env
 ENV_PATH = ".env"
@@ -20,3 +21,91 @@ SUPABASE_URL = os.getenv("SUPABASE_URL")
 SUPABASE_SERVICE_ROLE_KEY = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
 AUTH_BASE_URL = os.getenv("AUTH_BASE_URL")
 AUTH_VALIDATE_PATH = os.getenv("AUTH_VALIDATE_PATH", "/me")
+AUTH_TIMEOUT_SECONDS = float(os.getenv("AUTH_TIMEOUT_SECONDS", "10.0"))
+AUTH_MAX_CONNECTIONS = int(os.getenv("AUTH_MAX_CONNECTIONS", "20"))
+
+# Circuit breaker por upstream (auth, database)
+CIRCUIT_WINDOW_SIZE = int(os.getenv("CIRCUIT_WINDOW_SIZE", "20"))
+CIRCUIT_MINIMUM_CALLS = int(os.getenv("CIRCUIT_MINIMUM_CALLS", "10"))
+CIRCUIT_FAILURE_RATE_THRESHOLD = float(os.getenv("CIRCUIT_FAILURE_RATE_THRESHOLD", "0.5"))
+CIRCUIT_SLOW_CALL_SECONDS = float(os.getenv("CIRCUIT_SLOW_CALL_SECONDS", "2.0"))
+CIRCUIT_SLOW_CALL_RATE_THRESHOLD = float(os.getenv("CIRCUIT_SLOW_CALL_RATE_THRESHOLD", "0.5"))
+CIRCUIT_OPEN_SECONDS = float(os.getenv("CIRCUIT_OPEN_SECONDS", "30.0"))
+CIRCUIT_HALF_OPEN_MAX_CALLS = int(os.getenv("CIRCUIT_HALF_OPEN_MAX_CALLS", "3"))
+
+# Reintentos con backoff exponencial y jitter (solo lecturas idempotentes)
+RETRY_MAX_ATTEMPTS = int(os.getenv("RETRY_MAX_ATTEMPTS", "3"))
+RETRY_BASE_DELAY_SECONDS = float(os.getenv("RETRY_BASE_DELAY_SECONDS", "0.1"))
+RETRY_MAX_DELAY_SECONDS = float(os.getenv("RETRY_MAX_DELAY_SECONDS", "1.0"))
+
+# Control de admisión (límites de concurrencia por tipo de ruta y por token)
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+ADMISSION_CHEAP_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_CHEAP_MAX_IN_FLIGHT", "32"))
+ADMISSION_CHEAP_MAX_QUEUE = int(os.getenv("ADMISSION_CHEAP_MAX_QUEUE", "64"))
+ADMISSION_EXPENSIVE_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_EXPENSIVE_MAX_IN_FLIGHT", "8"))
+ADMISSION_EXPENSIVE_MAX_QUEUE = int(os.getenv("ADMISSION_EXPENSIVE_MAX_QUEUE", "16"))
+ADMISSION_QUEUE_TIMEOUT_SECONDS = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2.0"))
+ADMISSION_PER_TOKEN_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_PER_TOKEN_MAX_IN_FLIGHT", "8"))
+
+# Métricas Prometheus (GET /metrics)
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Trazas por petición y slow log
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() in ("1", "true", "yes")
+SLOW_REQUEST_THRESHOLD_MS = float(os.getenv("SLOW_REQUEST_THRESHOLD_MS", "1000"))
+
+# Profiler de muestreo bajo demanda (endpoints /admin/profiling, desactivado por defecto)
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILING_INTERVAL_MS = float(os.getenv("PROFILING_INTERVAL_MS", "10"))
+PROFILING_MAX_SECONDS = float(os.getenv("PROFILING_MAX_SECONDS", "300"))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Arranque: warm-up de conexiones y readiness (GET /readyz)
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "2.0"))
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "5.0"))
+
+# Servidor de producción (python -m app); los argumentos de línea de comandos tienen prioridad
+SERVER_HOST = os.getenv("SERVER_HOST", "0.0.0.0")
+SERVER_PORT = int(os.getenv("PORT", os.getenv("SERVER_PORT", "8000")))
+# CPUs que el proceso puede usar de verdad: os.cpu_count() devuelve los del host
+# aunque la afinidad (p. ej. cpuset del contenedor) lo limite. No refleja cuotas
+# de CPU (cpu.max), así que en contenedores conviene fijar WEB_CONCURRENCY.
+_AVAILABLE_CPUS = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else (os.cpu_count() or 1)
+SERVER_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(_AVAILABLE_CPUS)))
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")  # auto | uvloop | asyncio
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")  # auto | httptools | h11
+SERVER_KEEPALIVE_SECONDS = int(os.getenv("SERVER_KEEPALIVE_SECONDS", "5"))
+SERVER_BACKLOG = int(os.getenv("SERVER_BACKLOG", "2048"))
+
+# Cache compartida entre workers del mismo host (archivo mapeado en memoria)
+SHARED_CACHE_ENABLED = os.getenv("SHARED_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+SHARED_CACHE_PATH = os.getenv(
+    "SHARED_CACHE_PATH",
+    os.path.join("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir(), "oncoassist-cache"),
+)
+SHARED_CACHE_SLOTS = int(os.getenv("SHARED_CACHE_SLOTS", "8192"))
+SHARED_CACHE_SLOT_BYTES = int(os.getenv("SHARED_CACHE_SLOT_BYTES", "2048"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+PATIENT_CACHE_TTL_SECONDS = float(os.getenv("PATIENT_CACHE_TTL_SECONDS", "30"))
+
+# Búsqueda de historias clínicas parecidas (índice en memoria por worker)
+SIMILARITY_ENABLED = os.getenv("SIMILARITY_ENABLED", "true").lower() in ("1", "true", "yes")
+SIMILARITY_INDEX = os.getenv("SIMILARITY_INDEX", "auto")  # auto | brute_force | partitioned
+SIMILARITY_PARTITION_THRESHOLD = int(os.getenv("SIMILARITY_PARTITION_THRESHOLD", "500000"))
+SIMILARITY_PARTITIONS = int(os.getenv("SIMILARITY_PARTITIONS", "0"))  # 0 = raíz cuadrada del número de filas
+SIMILARITY_PROBES = int(os.getenv("SIMILARITY_PROBES", "8"))
+SIMILARITY_MAX_K = int(os.getenv("SIMILARITY_MAX_K", "100"))
+SIMILARITY_SYNC_SECONDS = float(os.getenv("SIMILARITY_SYNC_SECONDS", "30"))
+# `edited` es el inicio de la transacción (now()), no el commit: la sincronización
+# relee este margen antes de la marca para no perder escrituras que tardaron en confirmarse
+SIMILARITY_SYNC_OVERLAP_SECONDS = float(os.getenv("SIMILARITY_SYNC_OVERLAP_SECONDS", str(SIMILARITY_SYNC_SECONDS)))
+SIMILARITY_REBUILD_SECONDS = float(os.getenv("SIMILARITY_REBUILD_SECONDS", "3600"))
+
+# Compresión de respuestas negociada por Accept-Encoding (por defecto, la de mayor ratio que acepte el cliente)
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "true").lower() in ("1", "true", "yes")
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_ENCODINGS = [e.strip().lower() for e in os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip").split(",") if e.strip()]
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
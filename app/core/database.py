@@ -1,20 +1,45 @@
 import logging
-from supabase import create_client, Client
+import threading
+from typing import TYPE_CHECKING, Optional
+
 from .config import SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY
 
+if TYPE_CHECKING:
+    from supabase import Client
+
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Validar que las variables estén configuradas
-if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
-    raise RuntimeError(
-        "Faltan variables de entorno SUPABASE_URL o SUPABASE_SERVICE_ROLE_KEY"
-    )
-
-try:
-    supabase: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
-    logger.info("Conexión a Supabase establecida correctamente")
-except Exception as e:
-    logger.error(f"Error al conectar con Supabase: {e}")
-    raise RuntimeError(f"No se pudo conectar con Supabase: {e}")
+_client: Optional["Client"] = None
+_client_lock = threading.Lock()
+
+
+def get_supabase() -> "Client":
+    """Devuelve el cliente de Supabase, creándolo en el primer uso.
+
+    El paquete `supabase` se importa aquí y no al importar el módulo: es la
+    dependencia más pesada de la app y así importar routers o servicios
+    (tests, herramientas, arranque) no la carga ni exige las variables de entorno.
+    """
+    global _client
+    if _client is not None:
+        return _client
+    with _client_lock:
+        if _client is not None:
+            return _client
+
+        # Validar que las variables estén configuradas
+        if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
+            raise RuntimeError(
+                "Faltan variables de entorno SUPABASE_URL o SUPABASE_SERVICE_ROLE_KEY"
+            )
+
+        try:
+            from supabase import create_client
+            _client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+            logger.info("Conexión a Supabase establecida correctamente")
+        except Exception as e:
+            logger.error(f"Error al conectar con Supabase: {e}")
+            raise RuntimeError(f"No se pudo conectar con Supabase: {e}")
+        return _client
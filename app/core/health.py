@@ -0,0 +1,112 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from typing import Callable, Dict, Tuple
+
+from .config import (
+    AUTH_BASE_URL,
+    READINESS_TIMEOUT_SECONDS,
+    READINESS_CACHE_SECONDS,
+)
+from .database import get_supabase
+from .security import get_auth_client
+
+logger = logging.getLogger(__name__)
+
+_warmed_up = threading.Event()
+_readiness_lock = threading.Lock()
+_readiness_cache: Tuple[float, bool, Dict[str, dict]] = (0.0, False, {})
+# Los checks corren en paralelo y con tope de tiempo: un upstream colgado no bloquea /readyz
+_check_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="readiness")
+
+
+def check_database() -> None:
+    # Consulta mínima: abre (o reutiliza) la conexión del pool de PostgREST
+    get_supabase().table("patient").select("document_id").limit(1).execute()
+
+
+def check_auth() -> None:
+    if not AUTH_BASE_URL:
+        raise RuntimeError("AUTH_BASE_URL is not configured")
+    # Cualquier respuesta HTTP indica que el servicio es alcanzable
+    get_auth_client().get(AUTH_BASE_URL, timeout=READINESS_TIMEOUT_SECONDS)
+
+
+CHECKS: Dict[str, Callable[[], None]] = {
+    "database": check_database,
+    "auth": check_auth,
+}
+
+
+def _run_check(check: Callable[[], None]) -> dict:
+    start = time.perf_counter()
+    try:
+        check()
+        ok, error = True, None
+    except Exception as e:
+        ok, error = False, f"{type(e).__name__}: {e}"
+    result = {"ok": ok, "latency_ms": round((time.perf_counter() - start) * 1000, 1)}
+    if error:
+        result["error"] = error
+    return result
+
+
+def _run_checks() -> Dict[str, dict]:
+    """Ejecuta los `CHECKS` en paralelo con un tope total de `READINESS_TIMEOUT_SECONDS`.
+
+    Un check que no termina a tiempo se da por fallido; su hilo sigue en el
+    executor hasta que venza el timeout del cliente, pero nadie lo espera.
+    """
+    futures = {name: _check_executor.submit(_run_check, check) for name, check in CHECKS.items()}
+    deadline = time.monotonic() + READINESS_TIMEOUT_SECONDS
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result(timeout=max(deadline - time.monotonic(), 0))
+        except FutureTimeoutError:
+            results[name] = {"ok": False, "error": f"timed out after {READINESS_TIMEOUT_SECONDS}s"}
+    return results
+
+
+def warm_up(*hooks: Callable[[], object]) -> None:
+    """Prepara el worker antes de recibir tráfico.
+
+    Construye el cliente de Supabase (y con él el import de `supabase`), abre
+    las conexiones con la base de datos y el servicio de auth y ejecuta los
+    `hooks` adicionales (p. ej. generar el esquema OpenAPI). Los checks tienen el
+    mismo tope de tiempo que `/readyz`, así que un upstream caído no retrasa el
+    arranque más de `READINESS_TIMEOUT_SECONDS`. Los fallos solo se registran:
+    el worker arranca igual y `/readyz` los reporta.
+    """
+    start = time.perf_counter()
+    for name, result in _run_checks().items():
+        if not result["ok"]:
+            logger.warning(f"Warm-up of {name} failed: {result['error']}")
+    for hook in hooks:
+        try:
+            hook()
+        except Exception as e:
+            logger.warning(f"Warm-up hook {getattr(hook, '__name__', hook)} failed: {e}")
+    _warmed_up.set()
+    logger.info(f"Warm-up finished in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+
+def skip_warm_up() -> None:
+    # Con WARMUP_ENABLED=false el primer request paga la inicialización
+    _warmed_up.set()
+
+
+def readiness() -> Tuple[bool, Dict[str, dict]]:
+    """Estado de los upstreams, cacheado `READINESS_CACHE_SECONDS` para no saturarlos."""
+    global _readiness_cache
+    if not _warmed_up.is_set():
+        return False, {"warm_up": {"ok": False, "error": "warm-up in progress"}}
+    with _readiness_lock:
+        checked_at, ready, checks = _readiness_cache
+        if time.monotonic() - checked_at < READINESS_CACHE_SECONDS:
+            return ready, checks
+        checks = _run_checks()
+        ready = all(check["ok"] for check in checks.values())
+        _readiness_cache = (time.monotonic(), ready, checks)
+        return ready, checks
@@ -0,0 +1,203 @@
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional
+
+from .config import PROFILING_INTERVAL_MS, PROFILING_MAX_SECONDS
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+MODE_PROCESS = "process"
+MODE_REQUESTS = "requests"
+
+RUNNING = "running"
+FINISHED = "finished"
+
+# Sesiones terminadas que se conservan para descargar
+MAX_FINISHED_SESSIONS = 10
+# Por debajo de este intervalo el hilo de muestreo acapara el GIL y frena al worker
+MIN_INTERVAL_MS = 5.0
+
+
+class ProfilerBusyError(Exception):
+    """Ya hay una sesión de profiling en curso."""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+
+def _collapse(frame) -> str:
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class ProfileSession:
+    def __init__(
+        self,
+        mode: str,
+        interval: float,
+        duration: float,
+        route: Optional[str] = None,
+        method: Optional[str] = None,
+        count: int = 0,
+    ):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.interval = interval
+        self.duration = duration
+        self.route = route
+        self.method = method.upper() if method else None
+        self.count = count
+        self.requests_started = 0
+        self.requests_finished = 0
+        self.state = RUNNING
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.samples: Counter = Counter()
+        self.sample_ticks = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "state": self.state,
+            "route": self.route,
+            "method": self.method,
+            "count": self.count,
+            "requests_profiled": self.requests_finished,
+            "interval_ms": self.interval * 1000,
+            "max_seconds": self.duration,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "sample_ticks": self.sample_ticks,
+            "stacks": len(self.samples),
+        }
+
+    def collapsed(self) -> str:
+        """Stacks en formato "collapsed" (flamegraph.pl, speedscope, inferno)."""
+        lines = [f"{stack} {count}" for stack, count in self.samples.most_common()]
+        return "\n".join(lines) + ("\n" if lines else "")
+
+
+class SamplingProfiler:
+    """Profiler de muestreo basado en `sys._current_frames()`.
+
+    Un hilo en segundo plano toma una muestra de las pilas cada `interval`
+    segundos. En modo `process` se muestrean todos los hilos durante la
+    duración indicada; en modo `requests` solo los hilos que están
+    ejecutando alguna de las próximas N peticiones a la ruta indicada.
+    Solo hay una sesión activa a la vez.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._active: Optional[ProfileSession] = None
+        self._sessions: "OrderedDict[str, ProfileSession]" = OrderedDict()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    # --- Listener de rutas (ver tracing.TracedAPIRoute.handle) ---
+
+    def enter(self, method: str, route_path: str) -> bool:
+        with self._lock:
+            session = self._active
+            if session is None or session.mode != MODE_REQUESTS:
+                return False
+            if session.route != route_path or (session.method and session.method != method):
+                return False
+            if session.requests_started >= session.count:
+                return False
+            session.requests_started += 1
+            return True
+
+    def exit(self) -> None:
+        with self._lock:
+            session = self._active
+            if session is None or session.mode != MODE_REQUESTS:
+                return
+            session.requests_finished += 1
+            if session.requests_finished >= session.count:
+                self._stop.set()
+
+    # --- Gestión de sesiones ---
+
+    def start(
+        self,
+        mode: str,
+        seconds: Optional[float] = None,
+        route: Optional[str] = None,
+        method: Optional[str] = None,
+        count: int = 0,
+        interval_ms: float = PROFILING_INTERVAL_MS,
+    ) -> ProfileSession:
+        duration = min(seconds or PROFILING_MAX_SECONDS, PROFILING_MAX_SECONDS)
+        interval_ms = max(interval_ms, MIN_INTERVAL_MS)
+        session = ProfileSession(mode, interval_ms / 1000, duration, route, method, count)
+        with self._lock:
+            if self._active is not None:
+                raise ProfilerBusyError(self._active.id)
+            self._active = session
+            self._sessions[session.id] = session
+            self._stop.clear()
+            if mode == MODE_REQUESTS:
+                tracing.set_route_listener(self)
+            self._thread = threading.Thread(target=self._run, args=(session,), name="sampling-profiler", daemon=True)
+            self._thread.start()
+        logger.info(f"Profiling session {session.id} started ({mode})")
+        return session
+
+    def stop(self, session_id: str) -> Optional[ProfileSession]:
+        session = self._sessions.get(session_id)
+        if session is not None and session is self._active:
+            self._stop.set()
+            if self._thread is not None:
+                self._thread.join()
+        return session
+
+    def get(self, session_id: str) -> Optional[ProfileSession]:
+        return self._sessions.get(session_id)
+
+    def sessions(self) -> List[ProfileSession]:
+        return list(self._sessions.values())
+
+    def _run(self, session: ProfileSession) -> None:
+        own_ident = threading.get_ident()
+        deadline = time.monotonic() + session.duration
+        try:
+            while not self._stop.wait(session.interval) and time.monotonic() < deadline:
+                frames: Dict[int, object] = sys._current_frames()
+                if session.mode == MODE_REQUESTS:
+                    targets = tracing.profiled_thread_ids()
+                else:
+                    targets = frames.keys()
+                for ident in targets:
+                    frame = frames.get(ident)
+                    if frame is not None and ident != own_ident:
+                        session.samples[_collapse(frame)] += 1
+                session.sample_ticks += 1
+                del frames
+        finally:
+            with self._lock:
+                if session.mode == MODE_REQUESTS:
+                    tracing.set_route_listener(None)
+                session.state = FINISHED
+                session.finished_at = time.time()
+                self._active = None
+                finished = [s for s in self._sessions.values() if s.state == FINISHED]
+                for old in finished[:-MAX_FINISHED_SESSIONS]:
+                    del self._sessions[old.id]
+            logger.info(f"Profiling session {session.id} finished")
+
+
+profiler = SamplingProfiler()
@@ -0,0 +1,263 @@
+import logging
+import random
+import threading
+import time
+from collections import deque
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+import httpx
+
+from .config import (
+    CIRCUIT_WINDOW_SIZE,
+    CIRCUIT_MINIMUM_CALLS,
+    CIRCUIT_FAILURE_RATE_THRESHOLD,
+    CIRCUIT_SLOW_CALL_SECONDS,
+    CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+    CIRCUIT_OPEN_SECONDS,
+    CIRCUIT_HALF_OPEN_MAX_CALLS,
+    RETRY_MAX_ATTEMPTS,
+    RETRY_BASE_DELAY_SECONDS,
+    RETRY_MAX_DELAY_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """El circuito del upstream está abierto: la llamada se rechaza sin intentarla."""
+
+    def __init__(self, upstream: str, retry_after: float):
+        super().__init__(f"{upstream} unavailable (circuit open)")
+        self.upstream = upstream
+        self.retry_after = retry_after
+
+
+# Clases SQLSTATE de Postgres que indican un problema del servidor y no de la petición:
+# conexión (08), recursos agotados (53), intervención del operador (57) y error del sistema (58)
+TRANSIENT_SQLSTATE_CLASSES = ("08", "53", "57", "58")
+# Conflictos de concurrencia que se resuelven repitiendo la operación
+TRANSIENT_SQLSTATES = ("40001", "40P01")  # serialization_failure, deadlock_detected
+# Timeouts del lado de la base de datos: statement_timeout y espera de conexión del pool de PostgREST
+TIMEOUT_CODES = ("57014", "PGRST003")
+
+
+def _api_error_code(exc: Exception) -> Optional[str]:
+    """Código de un `postgrest.APIError`, o None si `exc` no lo es.
+
+    postgrest se importa aquí y no al cargar el módulo: a estas alturas ya se ha
+    hecho una llamada a la base de datos, así que no cuesta nada.
+    """
+    try:
+        from postgrest.exceptions import APIError
+    except ImportError:
+        return None
+    if not isinstance(exc, APIError):
+        return None
+    return str(exc.code or "")
+
+
+def _is_transient_api_error(code: str) -> bool:
+    if len(code) == 3 and code.isdigit():
+        # Respuesta sin JSON (p. ej. un 502 del proxy): postgrest deja el status HTTP como código
+        return int(code) >= 500
+    if code.startswith("PGRST"):
+        # PGRST0xx: PostgREST no llega a la base de datos o agota su pool (503/504).
+        # El resto (PGRST1xx, 2xx, 3xx) son errores de la petición, el esquema o el JWT
+        return code.startswith("PGRST0")
+    # SQLSTATE: restricciones (23), datos inválidos (22), SQL (42), etc. son errores del cliente
+    return code[:2] in TRANSIENT_SQLSTATE_CLASSES or code in TRANSIENT_SQLSTATES
+
+
+def is_transient_error(exc: Exception) -> bool:
+    """Errores que indican un upstream degradado (y no un error del cliente)."""
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code >= 500
+    if isinstance(exc, httpx.RequestError):
+        return True
+    code = _api_error_code(exc)
+    return code is not None and _is_transient_api_error(code)
+
+
+def is_retryable_error(exc: Exception) -> bool:
+    """Errores transitorios que vale la pena reintentar.
+
+    Los timeouts cuentan como fallo para el breaker pero no se reintentan: cada
+    intento ya ha agotado el timeout, y reintentar multiplicaría la espera antes
+    de que el breaker pueda abrirse.
+    """
+    if not is_transient_error(exc) or isinstance(exc, httpx.TimeoutException):
+        return False
+    return _api_error_code(exc) not in TIMEOUT_CODES
+
+
+class CircuitBreaker:
+    """Circuit breaker por conteo sobre las últimas `window_size` llamadas.
+
+    Se abre cuando la tasa de errores o de llamadas lentas supera su umbral,
+    rechaza llamadas durante `open_seconds` y después deja pasar hasta
+    `half_open_max_calls` llamadas de prueba antes de cerrarse de nuevo.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        window_size: int = CIRCUIT_WINDOW_SIZE,
+        minimum_calls: int = CIRCUIT_MINIMUM_CALLS,
+        failure_rate_threshold: float = CIRCUIT_FAILURE_RATE_THRESHOLD,
+        slow_call_seconds: float = CIRCUIT_SLOW_CALL_SECONDS,
+        slow_call_rate_threshold: float = CIRCUIT_SLOW_CALL_RATE_THRESHOLD,
+        open_seconds: float = CIRCUIT_OPEN_SECONDS,
+        half_open_max_calls: int = CIRCUIT_HALF_OPEN_MAX_CALLS,
+    ):
+        self.name = name
+        self.minimum_calls = minimum_calls
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate_threshold = slow_call_rate_threshold
+        self.open_seconds = open_seconds
+        self.half_open_max_calls = half_open_max_calls
+
+        self._lock = threading.Lock()
+        # Cada entrada es (failed, slow)
+        self._window: deque = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+        self._half_open_successes = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+            self._half_open_successes = 0
+            logger.info(f"Circuit '{self.name}' half-open")
+
+    def _open(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._window.clear()
+        logger.warning(f"Circuit '{self.name}' opened")
+
+    def _close(self) -> None:
+        self._state = CLOSED
+        self._window.clear()
+        logger.info(f"Circuit '{self.name}' closed")
+
+    def before_call(self) -> bool:
+        """Reserva un permiso para llamar. Devuelve True si la llamada es de prueba."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == OPEN:
+                retry_after = self.open_seconds - (time.monotonic() - self._opened_at)
+                raise CircuitOpenError(self.name, max(retry_after, 0.0))
+            if self._state == HALF_OPEN:
+                if self._half_open_in_flight >= self.half_open_max_calls:
+                    raise CircuitOpenError(self.name, self.open_seconds)
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def record(self, elapsed: float, failed: bool, probe: bool = False) -> None:
+        slow = elapsed >= self.slow_call_seconds
+        with self._lock:
+            if probe:
+                self._half_open_in_flight -= 1
+                if self._state != HALF_OPEN:
+                    return
+                if failed or slow:
+                    self._open()
+                    return
+                self._half_open_successes += 1
+                if self._half_open_successes >= self.half_open_max_calls:
+                    self._close()
+                return
+
+            if self._state != CLOSED:
+                return
+            self._window.append((failed, slow))
+            calls = len(self._window)
+            if calls < self.minimum_calls:
+                return
+            failures = sum(1 for f, _ in self._window if f)
+            slow_calls = sum(1 for _, s in self._window if s)
+            if (
+                failures / calls >= self.failure_rate_threshold
+                or slow_calls / calls >= self.slow_call_rate_threshold
+            ):
+                self._open()
+
+    def call(self, func: Callable, *args, **kwargs):
+        probe = self.before_call()
+        start = time.monotonic()
+        try:
+            result = func(*args, **kwargs)
+        except Exception as exc:
+            self.record(time.monotonic() - start, failed=is_transient_error(exc), probe=probe)
+            raise
+        self.record(time.monotonic() - start, failed=False, probe=probe)
+        return result
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(upstream: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(upstream)
+        if breaker is None:
+            breaker = _breakers[upstream] = CircuitBreaker(upstream)
+        return breaker
+
+
+def backoff_delay(attempt: int) -> float:
+    """Backoff exponencial con "full jitter" para el reintento número `attempt` (desde 0)."""
+    cap = min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt))
+    return random.uniform(0, cap)
+
+
+def call_with_retry(breaker: CircuitBreaker, func: Callable, *args, **kwargs):
+    """Llama a `func` a través del breaker reintentando errores transitorios.
+
+    Solo debe usarse con operaciones idempotentes (lecturas). Los timeouts no se
+    reintentan (ver `is_retryable_error`).
+    """
+    attempts = max(RETRY_MAX_ATTEMPTS, 1)
+    for attempt in range(attempts):
+        try:
+            return breaker.call(func, *args, **kwargs)
+        except CircuitOpenError:
+            raise
+        except Exception as exc:
+            if not is_retryable_error(exc) or attempt + 1 >= attempts:
+                raise
+            delay = backoff_delay(attempt)
+            logger.info(f"Retrying '{breaker.name}' call in {delay:.3f}s after: {exc}")
+            time.sleep(delay)
+
+
+def circuit_protected(upstream: str, idempotent: bool = False):
+    """Decorador que protege una llamada a `upstream` con su circuit breaker.
+
+    Las operaciones marcadas como `idempotent` además se reintentan.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            breaker = get_breaker(upstream)
+            if idempotent:
+                return call_with_retry(breaker, func, *args, **kwargs)
+            return breaker.call(func, *args, **kwargs)
+        return wrapper
+    return decorator
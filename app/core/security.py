@@ -1,18 +1,66 @@
+import hmac
+import logging
+import math
+import threading
 from typing import Optional
 
 import httpx
-from fastapi import HTTPException, status, Request, Security, Depends
+from fastapi import HTTPException, status, Request, Security, Depends, Header
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from .config import AUTH_BASE_URL, AUTH_VALIDATE_PATH
+from .config import (
+    AUTH_BASE_URL,
+    AUTH_VALIDATE_PATH,
+    AUTH_TIMEOUT_SECONDS,
+    AUTH_MAX_CONNECTIONS,
+    ADMIN_TOKEN,
+    TOKEN_CACHE_TTL_SECONDS,
+)
+from .resilience import CircuitOpenError, call_with_retry, get_breaker
+from .metrics import observe_upstream
+from .shared_cache import cache_get, cache_set
+from .tracing import REQUEST_ID_HEADER, current_request_id, span
+
+logger = logging.getLogger(__name__)
 
 http_bearer = HTTPBearer(auto_error=False)
 
+# Retry-After cuando el servicio de auth falla sin que el circuito esté abierto
+AUTH_UNAVAILABLE_RETRY_AFTER_SECONDS = 1
+
+# Cliente HTTP compartido: reutiliza conexiones keep-alive con el servicio de auth
+# en lugar de abrir un cliente (y un handshake) por petición
+_auth_client: Optional[httpx.Client] = None
+_auth_client_lock = threading.Lock()
+
+
+def get_auth_client() -> httpx.Client:
+    global _auth_client
+    if _auth_client is None:
+        with _auth_client_lock:
+            if _auth_client is None:
+                _auth_client = httpx.Client(
+                    timeout=AUTH_TIMEOUT_SECONDS,
+                    limits=httpx.Limits(
+                        max_connections=AUTH_MAX_CONNECTIONS,
+                        max_keepalive_connections=AUTH_MAX_CONNECTIONS,
+                    ),
+                )
+    return _auth_client
+
+
+def close_auth_client() -> None:
+    global _auth_client
+    with _auth_client_lock:
+        if _auth_client is not None:
+            _auth_client.close()
+            _auth_client = None
+
 
 def _get_auth_service_config() -> tuple[Optional[str], str]:
     base_url = AUTH_BASE_URL
-    print(f"base_url: {base_url}")
+    logger.debug(f"base_url: {base_url}")
     validate_path = AUTH_VALIDATE_PATH
-    print(f"validate_path: {validate_path}")
+    logger.debug(f"validate_path: {validate_path}")
     return base_url, validate_path
 
 
@@ -24,9 +72,31 @@ def _raise_forbidden(detail: str) -> None:
     raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
 
 
+def _raise_unavailable(detail: str, retry_after: float) -> None:
+    raise HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": str(max(math.ceil(retry_after), 1))},
+    )
+
+
+def _call_auth_service(url: str, token: str) -> httpx.Response:
+    headers = {"Authorization": f"Bearer {token}"}
+    request_id = current_request_id()
+    if request_id:
+        # Propagamos el request ID para poder correlacionar con los logs del servicio de auth
+        headers[REQUEST_ID_HEADER] = request_id
+    # La API de auth actual valida con GET /me y el header Authorization: Bearer <token>
+    response = get_auth_client().get(url, headers=headers)
+    if response.status_code >= 500:
+        # Los 5xx cuentan como fallo del upstream para el circuit breaker
+        response.raise_for_status()
+    return response
+
+
+@observe_upstream("auth", "validate_token")
 def _validate_token_with_auth_service(token: str) -> dict:
     base_url, path = _get_auth_service_config()
-    print(f"base_url_2: {base_url}")
 
     if not base_url:
         # Si no hay servicio de auth configurado, asumimos que el token es inválido
@@ -34,15 +104,17 @@ def _validate_token_with_auth_service(token: str) -> dict:
 
     url = f"{base_url.rstrip('/')}{path}"
     try:
-        with httpx.Client(timeout=10.0) as client:
-            # La API de auth actual valida con GET /me y el header Authorization: Bearer <token>
-            response = client.get(url, headers={"Authorization": f"Bearer {token}"})
-    except httpx.TimeoutException:
-        # Si el servicio de auth no responde, asumimos que el token es inválido
-        _raise_forbidden("Invalid token")
-    except httpx.RequestError as e:
-        # Si no se puede conectar al servicio de auth, asumimos que el token es inválido
-        _raise_forbidden("Invalid token")
+        # GET /me es idempotente: se reintenta con backoff y se corta si el circuito está abierto
+        response = call_with_retry(get_breaker("auth"), _call_auth_service, url, token)
+    except CircuitOpenError as e:
+        # El servicio de auth está degradado: fallamos rápido en lugar de esperar el timeout
+        _raise_unavailable("Auth service unavailable", e.retry_after)
+    except (httpx.HTTPStatusError, httpx.TimeoutException, httpx.RequestError) as e:
+        # 5xx, timeout o sin conexión tras los reintentos: es una caída del servicio de
+        # auth, no un token inválido. Mismo 503 que con el circuito abierto, para que
+        # el cliente reintente en lugar de descartar un token que puede ser válido
+        logger.warning(f"Auth service unavailable: {e!r}")
+        _raise_unavailable("Auth service unavailable", AUTH_UNAVAILABLE_RETRY_AFTER_SECONDS)
 
     if response.status_code == 200:
         # Devolvemos la información del usuario autenticado como token_info
@@ -62,17 +134,29 @@ def require_token(
     credentials: Optional[HTTPAuthorizationCredentials] = Depends(http_bearer),
     request: Request = None,
 ):
-    if credentials is None:
-        _raise_unauthorized("Authorization required")
+    with span("require_token"):
+        if credentials is None:
+            _raise_unauthorized("Authorization required")
     
-    token = credentials.credentials
-    if not token:
-        _raise_unauthorized("Authorization required")
+        token = credentials.credentials
+        if not token:
+            _raise_unauthorized("Authorization required")
     
-    token_info = _validate_token_with_auth_service(token)
-    # Attach token info to request state for downstream use if needed
-    if request is not None:
-        setattr(request.state, "token_info", token_info)
-    return token_info
-
-
+        # Los tokens ya validados se comparten entre workers durante TOKEN_CACHE_TTL_SECONDS;
+        # solo se cachean validaciones correctas, nunca rechazos
+        token_info = cache_get("token", token)
+        if token_info is None:
+            token_info = _validate_token_with_auth_service(token)
+            cache_set("token", token, token_info, TOKEN_CACHE_TTL_SECONDS)
+        # Attach token info to request state for downstream use if needed
+        if request is not None:
+            setattr(request.state, "token_info", token_info)
+        return token_info
+
+
+def require_admin_token(x_admin_token: Optional[str] = Header(None)):
+    # Endpoints de operación: se validan contra ADMIN_TOKEN y no contra el servicio de auth
+    if not x_admin_token:
+        _raise_unauthorized("Admin token required")
+    if not ADMIN_TOKEN or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        _raise_forbidden("Invalid admin token")
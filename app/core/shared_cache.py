@@ -0,0 +1,211 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock no hay forma segura de compartir el archivo
+    fcntl = None
+
+from .config import (
+    SHARED_CACHE_ENABLED,
+    SHARED_CACHE_PATH,
+    SHARED_CACHE_SLOTS,
+    SHARED_CACHE_SLOT_BYTES,
+)
+from .metrics import shared_cache_requests_total
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"ONCOSHC1"
+# Cabecera del archivo: magic, número de slots y tamaño de slot (rellenada a 64 bytes)
+HEADER = struct.Struct("<8sII")
+HEADER_SIZE = 64
+# Cabecera de cada slot: digest de la clave, expiración (epoch) y longitud del valor
+SLOT_HEADER = struct.Struct("<16sdI")
+# Slots consecutivos que se revisan a partir del hash (sondeo lineal acotado)
+PROBES = 8
+
+
+class SharedCache:
+    """Cache clave/valor con TTL en un archivo mapeado en memoria, compartido por los workers del host.
+
+    Es una tabla hash de tamaño fijo (`slots` x `slot_size` bytes): el tamaño
+    total está acotado y, si no hay hueco en la ventana de sondeo, se desaloja
+    la entrada que expira antes. Solo se guarda el digest BLAKE2 de cada clave,
+    nunca la clave (p. ej. el token) en claro. Los valores se serializan a JSON
+    y los que no caben en un slot simplemente no se cachean.
+
+    El acceso entre procesos se serializa con `flock` sobre el archivo y entre
+    hilos con un lock propio.
+    """
+
+    def __init__(self, path: str, slots: int, slot_size: int, reset: bool = False):
+        self.path = path
+        self.slots = slots
+        self.slot_size = slot_size
+        self.max_value_size = slot_size - SLOT_HEADER.size
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        size = HEADER_SIZE + slots * slot_size
+
+        # O_NOFOLLOW: un enlace simbólico plantado en la ruta no redirige la cache a otro archivo
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, "O_NOFOLLOW", 0), 0o600)
+        try:
+            self._check_owner()
+            fcntl.flock(self._fd, fcntl.LOCK_EX)
+            try:
+                header = os.pread(self._fd, HEADER.size, 0)
+                if reset or header != HEADER.pack(MAGIC, slots, slot_size) or os.fstat(self._fd).st_size != size:
+                    # Archivo nuevo, de otra configuración o reinicio explícito: se vacía
+                    os.ftruncate(self._fd, 0)
+                    os.ftruncate(self._fd, size)
+                    os.pwrite(self._fd, HEADER.pack(MAGIC, slots, slot_size), 0)
+                self._map = mmap.mmap(self._fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    def _check_owner(self) -> None:
+        """Rechaza un archivo que no sea nuestro o que otros usuarios puedan leer o escribir.
+
+        La ruta es predecible y el modo 0600 de `os.open` solo se aplica al crear
+        el archivo: si otro usuario lo creó antes, podría escribir slots de
+        tokens (`namespace="token"`) y hacerlos pasar por autenticados.
+        """
+        st = os.fstat(self._fd)
+        if st.st_uid != os.geteuid() or st.st_mode & 0o077:
+            raise PermissionError(
+                f"{self.path} must be owned by uid {os.geteuid()} with no group/other permissions "
+                f"(found uid {st.st_uid}, mode {oct(st.st_mode & 0o777)})"
+            )
+
+    def _digest(self, namespace: str, key: str) -> bytes:
+        return hashlib.blake2b(f"{namespace}\0{key}".encode(), digest_size=16).digest()
+
+    def _window(self, digest: bytes):
+        first = int.from_bytes(digest[:8], "little") % self.slots
+        for i in range(PROBES):
+            yield HEADER_SIZE + ((first + i) % self.slots) * self.slot_size
+
+    @contextmanager
+    def _locked(self, operation: int):
+        with self._lock:
+            fcntl.flock(self._fd, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    def get(self, namespace: str, key: str) -> Optional[object]:
+        digest = self._digest(namespace, key)
+        now = time.time()
+        raw = None
+        with self._locked(fcntl.LOCK_SH):
+            for offset in self._window(digest):
+                slot_digest, expires, length = SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_digest == digest and expires > now:
+                    start = offset + SLOT_HEADER.size
+                    raw = self._map[start:start + length]
+                    break
+        shared_cache_requests_total.inc(namespace=namespace, result="hit" if raw is not None else "miss")
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, namespace: str, key: str, value: object, ttl: float) -> bool:
+        data = json.dumps(value, separators=(",", ":"), default=str).encode()
+        digest = self._digest(namespace, key)
+        if len(data) > self.max_value_size:
+            # No cabe en un slot: si había una versión anterior, ya no es válida
+            self.delete(namespace, key)
+            return False
+        now = time.time()
+        with self._locked(fcntl.LOCK_EX):
+            target = None
+            oldest = None
+            for offset in self._window(digest):
+                slot_digest, expires, _ = SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_digest == digest:
+                    target = offset
+                    break
+                if target is None and expires <= now:
+                    target = offset
+                if oldest is None or expires < oldest[0]:
+                    oldest = (expires, offset)
+            if target is None:
+                target = oldest[1]
+            SLOT_HEADER.pack_into(self._map, target, digest, now + ttl, len(data))
+            start = target + SLOT_HEADER.size
+            self._map[start:start + len(data)] = data
+        return True
+
+    def delete(self, namespace: str, key: str) -> None:
+        digest = self._digest(namespace, key)
+        with self._locked(fcntl.LOCK_EX):
+            for offset in self._window(digest):
+                slot_digest, _, _ = SLOT_HEADER.unpack_from(self._map, offset)
+                if slot_digest == digest:
+                    SLOT_HEADER.pack_into(self._map, offset, b"\0" * 16, 0.0, 0)
+
+    def close(self) -> None:
+        self._map.close()
+        os.close(self._fd)
+
+
+_cache: Optional[SharedCache] = None
+_cache_lock = threading.Lock()
+_cache_failed = False
+
+
+def get_shared_cache() -> Optional[SharedCache]:
+    """Devuelve la cache compartida del proceso, o None si está desactivada o no disponible.
+
+    Se abre en el primer uso dentro de cada worker: tras un fork, el descriptor
+    heredado compartiría el `flock` con el proceso padre, así que se reabre.
+    """
+    global _cache, _cache_failed
+    if not SHARED_CACHE_ENABLED or fcntl is None or _cache_failed:
+        return None
+    if _cache is not None and _cache.pid == os.getpid():
+        return _cache
+    with _cache_lock:
+        if _cache is None or _cache.pid != os.getpid():
+            try:
+                _cache = SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_SLOTS, SHARED_CACHE_SLOT_BYTES)
+            except (OSError, ValueError) as e:
+                # Sin cache compartida la API funciona igual, solo con más llamadas a upstreams
+                logger.warning(f"Shared cache disabled, could not open {SHARED_CACHE_PATH}: {e}")
+                _cache_failed = True
+                return None
+    return _cache
+
+
+def reset_shared_cache() -> None:
+    """Vacía el archivo de la cache; lo llama el proceso principal antes de lanzar los workers."""
+    if SHARED_CACHE_ENABLED and fcntl is not None:
+        SharedCache(SHARED_CACHE_PATH, SHARED_CACHE_SLOTS, SHARED_CACHE_SLOT_BYTES, reset=True).close()
+
+
+def cache_get(namespace: str, key: str) -> Optional[object]:
+    cache = get_shared_cache()
+    return cache.get(namespace, key) if cache is not None else None
+
+
+def cache_set(namespace: str, key: str, value: object, ttl: float) -> None:
+    cache = get_shared_cache()
+    if cache is not None and ttl > 0:
+        cache.set(namespace, key, value, ttl)
+
+
+def cache_delete(namespace: str, key: str) -> None:
+    cache = get_shared_cache()
+    if cache is not None:
+        cache.delete(namespace, key)
@@ -0,0 +1,268 @@
+import inspect
+import json
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Callable, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+from .config import SLOW_REQUEST_THRESHOLD_MS
+
+try:
+    from pythonjsonlogger.json import JsonFormatter
+except ImportError:
+    # python-json-logger no está instalado, el slow log se escribe como JSON a mano
+    JsonFormatter = None
+
+REQUEST_ID_HEADER = "X-Request-ID"
+
+
+class Trace:
+    """Spans de una petición. Los offsets y duraciones se guardan en milisegundos."""
+
+    __slots__ = ("request_id", "start", "spans", "endpoint_end", "profiled")
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.start = time.perf_counter()
+        self.spans: List[dict] = []
+        self.endpoint_end: Optional[float] = None
+        # Marcada por el profiler cuando la petición debe muestrearse
+        self.profiled = False
+
+    def add_span(self, name: str, start: float, end: float) -> None:
+        # list.append es atómico: los spans pueden llegar desde el threadpool
+        self.spans.append({
+            "name": name,
+            "offset_ms": round((start - self.start) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        })
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+
+
+# Hilos que están ejecutando código de una petición perfilada (ident -> profundidad)
+_profiled_threads: Dict[int, int] = {}
+_profiled_threads_lock = threading.Lock()
+
+# Listener opcional (ver app.core.profiling) que decide qué peticiones se perfilan
+_route_listener = None
+
+
+def set_route_listener(listener) -> None:
+    """Registra un objeto con `enter(method, route_path) -> bool` y `exit()`."""
+    global _route_listener
+    _route_listener = listener
+
+
+def profiled_thread_ids() -> List[int]:
+    with _profiled_threads_lock:
+        return list(_profiled_threads)
+
+
+@contextmanager
+def _profiled_thread():
+    ident = threading.get_ident()
+    with _profiled_threads_lock:
+        _profiled_threads[ident] = _profiled_threads.get(ident, 0) + 1
+    try:
+        yield
+    finally:
+        with _profiled_threads_lock:
+            depth = _profiled_threads[ident] - 1
+            if depth:
+                _profiled_threads[ident] = depth
+            else:
+                del _profiled_threads[ident]
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def current_request_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.request_id if trace else None
+
+
+@contextmanager
+def span(name: str):
+    """Mide un bloque dentro de la traza actual (no hace nada fuera de una petición)."""
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        if trace.profiled:
+            with _profiled_thread():
+                yield
+        else:
+            yield
+    finally:
+        trace.add_span(name, start, time.perf_counter())
+
+
+def _traced_endpoint(endpoint: Callable) -> Callable:
+    if getattr(endpoint, "__traced__", False):
+        # include_router vuelve a crear la ruta con el endpoint ya envuelto
+        return endpoint
+
+    def _finish(trace: Optional[Trace], start: float) -> None:
+        if trace is not None:
+            trace.endpoint_end = time.perf_counter()
+            trace.add_span("endpoint", start, trace.endpoint_end)
+
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def async_wrapper(*args, **kwargs):
+            trace, start = _current_trace.get(), time.perf_counter()
+            try:
+                if trace is not None and trace.profiled:
+                    with _profiled_thread():
+                        return await endpoint(*args, **kwargs)
+                return await endpoint(*args, **kwargs)
+            finally:
+                _finish(trace, start)
+        async_wrapper.__traced__ = True
+        return async_wrapper
+
+    @wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        trace, start = _current_trace.get(), time.perf_counter()
+        try:
+            if trace is not None and trace.profiled:
+                with _profiled_thread():
+                    return endpoint(*args, **kwargs)
+            return endpoint(*args, **kwargs)
+        finally:
+            _finish(trace, start)
+    wrapper.__traced__ = True
+    return wrapper
+
+
+class TracedAPIRoute(APIRoute):
+    """APIRoute que registra el span del endpoint.
+
+    Junto con `TracedJSONResponse` permite separar la validación del
+    response_model (lo que ocurre entre el fin del endpoint y la creación
+    de la respuesta) de la serialización a JSON.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, _traced_endpoint(endpoint), **kwargs)
+
+    async def handle(self, scope, receive, send) -> None:
+        trace = _current_trace.get()
+        listener = _route_listener
+        if trace is None or listener is None or not listener.enter(scope["method"], self.path):
+            await super().handle(scope, receive, send)
+            return
+        trace.profiled = True
+        try:
+            await super().handle(scope, receive, send)
+        finally:
+            listener.exit()
+
+
+class TracedJSONResponse(JSONResponse):
+    def render(self, content) -> bytes:
+        trace = _current_trace.get()
+        if trace is None:
+            return super().render(content)
+        start = time.perf_counter()
+        if trace.endpoint_end is not None:
+            trace.add_span("response_validation", trace.endpoint_end, start)
+        try:
+            return super().render(content)
+        finally:
+            trace.add_span("serialization", start, time.perf_counter())
+
+
+def _build_slow_logger() -> logging.Logger:
+    slow_logger = logging.getLogger("app.slow_requests")
+    if not slow_logger.handlers:
+        handler = logging.StreamHandler()
+        if JsonFormatter is not None:
+            handler.setFormatter(JsonFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        slow_logger.addHandler(handler)
+        slow_logger.propagate = False
+        slow_logger.setLevel(logging.INFO)
+    return slow_logger
+
+
+slow_logger = _build_slow_logger()
+
+
+def _valid_request_id(value: str) -> bool:
+    return 0 < len(value) <= 128 and value.isascii() and value.isprintable()
+
+
+class TracingMiddleware:
+    """Middleware ASGI que asigna un request ID y registra las peticiones lentas.
+
+    Reutiliza el `X-Request-ID` entrante si es válido y lo devuelve en la
+    respuesta. Las peticiones que superan `threshold_ms` se escriben en el
+    logger `app.slow_requests` en JSON con el desglose de spans.
+    """
+
+    def __init__(self, app, threshold_ms: float = SLOW_REQUEST_THRESHOLD_MS):
+        self.app = app
+        self.threshold_ms = threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                candidate = value.decode("latin-1")
+                if _valid_request_id(candidate):
+                    request_id = candidate
+                break
+        trace = Trace(request_id or uuid.uuid4().hex)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((REQUEST_ID_HEADER.lower().encode(), trace.request_id.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        token = _current_trace.set(trace)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_trace.reset(token)
+            duration_ms = (time.perf_counter() - trace.start) * 1000
+            if duration_ms >= self.threshold_ms:
+                self._log_slow(scope, trace, status_code, duration_ms)
+
+    @staticmethod
+    def _log_slow(scope, trace: Trace, status_code: int, duration_ms: float) -> None:
+        route = scope.get("route")
+        fields = {
+            "request_id": trace.request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": getattr(route, "path", None),
+            "status": status_code,
+            "duration_ms": round(duration_ms, 3),
+            "spans": trace.spans,
+        }
+        if JsonFormatter is not None:
+            slow_logger.warning("slow_request", extra=fields)
+        else:
+            slow_logger.warning(json.dumps({"message": "slow_request", **fields}))
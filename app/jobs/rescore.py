@@ -0,0 +1,246 @@
+"""Recalcula `treatment_id` y `treatment_recommendation` de todas las historias clínicas.
+
+Recorre `clinical_histories` por keyset sobre la PK en bloques, puntúa cada
+bloque en un pool de procesos con el scorer elegido y escribe solo las filas
+que cambian, un UPDATE por bloque (función `rescore_clinical_histories` de
+`app/sql/create_tables.sql`). Tras cada bloque escrito guarda un checkpoint con
+el último id, de modo que un job interrumpido se reanuda con `--resume`:
+
+    python -m app.jobs.rescore --scorer dummy --workers 4
+    python -m app.jobs.rescore --scorer mi_paquete.modelo:Scorer --resume
+
+Usa las mismas variables de entorno que la API (`SUPABASE_URL`,
+`SUPABASE_SERVICE_ROLE_KEY`) y pasa por el mismo circuit breaker y reintentos.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+
+from app.jobs.scorers import FEATURE_COLUMNS, load_scorer, resolve_scorer
+from app.services.clinical_history_service import ClinicalHistoryService
+
+logger = logging.getLogger("app.jobs.rescore")
+
+SCAN_COLUMNS = ",".join(["id", "treatment_id", "treatment_recommendation"] + FEATURE_COLUMNS)
+# PostgREST limita las respuestas a 1000 filas por defecto (max-rows)
+DEFAULT_CHUNK_SIZE = 1000
+
+_worker_scorer = None
+
+
+def _init_worker(spec: str, options: dict) -> None:
+    # Un scorer por proceso del pool: el modelo se carga una sola vez
+    global _worker_scorer
+    _worker_scorer = load_scorer(spec, options)
+
+
+def _score_chunk(rows: List[dict]) -> List[dict]:
+    """Puntúa un bloque y devuelve solo las filas cuyo resultado cambia."""
+    results = _worker_scorer.score(rows)
+    if len(results) != len(rows):
+        raise ValueError(f"Scorer returned {len(results)} results for {len(rows)} histories")
+    return [
+        {"id": row["id"], "treatment_id": result.get("treatment_id"), "treatment_recommendation": result.get("treatment_recommendation")}
+        for row, result in zip(rows, results)
+        if (row.get("treatment_id"), row.get("treatment_recommendation"))
+        != (result.get("treatment_id"), result.get("treatment_recommendation"))
+    ]
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Checkpoint:
+    """Estado del job en un archivo JSON, escrito de forma atómica tras cada bloque."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def load(self) -> Optional[dict]:
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path) as f:
+            return json.load(f)
+
+    def save(self, state: dict) -> None:
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({**state, "updated_at": _now()}, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+
+class Progress:
+    def __init__(self, total: Optional[int], interval: float, processed: int = 0, updated: int = 0):
+        self.total = total
+        self.interval = interval
+        self.processed = processed
+        self.updated = updated
+        self._start = time.monotonic()
+        self._start_processed = processed
+        self._last_report = 0.0
+
+    def advance(self, processed: int, updated: int) -> None:
+        self.processed += processed
+        self.updated += updated
+        if time.monotonic() - self._last_report >= self.interval:
+            self.report()
+
+    def report(self) -> None:
+        self._last_report = time.monotonic()
+        elapsed = self._last_report - self._start
+        rate = (self.processed - self._start_processed) / elapsed if elapsed > 0 else 0.0
+        message = f"Rescored {self.processed}"
+        if self.total:
+            remaining = max(self.total - self.processed, 0)
+            eta = f"{remaining / rate:.0f}s" if rate > 0 else "n/a"
+            message += f"/{self.total} ({self.processed / self.total * 100:.1f}%), ETA {eta}"
+        logger.info(f"{message}, {self.updated} updated, {rate:.0f} histories/s")
+
+
+def iter_chunks(after_id: int, chunk_size: int) -> Iterator[List[dict]]:
+    while True:
+        rows = ClinicalHistoryService.scan_clinical_histories(SCAN_COLUMNS, after_id, chunk_size)
+        # No se corta con len(rows) < chunk_size: PostgREST puede devolver menos que lo pedido
+        if not rows:
+            return
+        yield rows
+        after_id = rows[-1]["id"]
+
+
+def run(
+    scorer: str,
+    checkpoint_path: str,
+    workers: int = 1,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    resume: bool = False,
+    restart: bool = False,
+    dry_run: bool = False,
+    scorer_options: Optional[dict] = None,
+    progress_interval: float = 10.0,
+) -> dict:
+    scorer_class = resolve_scorer(scorer)
+    scorer_options = scorer_options or {}
+    checkpoint = Checkpoint(checkpoint_path)
+    previous = None if dry_run else checkpoint.load()
+
+    if previous and not (resume or restart):
+        raise RuntimeError(f"Checkpoint {checkpoint_path} exists: pass --resume to continue or --restart to start over")
+    if previous and resume:
+        if (previous["scorer_name"], previous["scorer_version"]) != (scorer_class.name, scorer_class.version):
+            raise RuntimeError(
+                f"Checkpoint was written by scorer {previous['scorer_name']} v{previous['scorer_version']}, "
+                f"not {scorer_class.name} v{scorer_class.version}"
+            )
+        state = previous
+        if state.get("finished"):
+            logger.info("Checkpoint says the job already finished; nothing to do")
+            return state
+        logger.info(f"Resuming after id {state['last_id']} ({state['processed']} already processed)")
+    else:
+        state = {
+            "scorer": scorer,
+            "scorer_name": scorer_class.name,
+            "scorer_version": scorer_class.version,
+            "started_at": _now(),
+            "last_id": 0,
+            "processed": 0,
+            "updated": 0,
+            "finished": False,
+        }
+
+    try:
+        total = state["processed"] + ClinicalHistoryService.count_clinical_histories(state["last_id"])
+    except Exception as e:
+        # El progreso sin total sigue siendo útil; no vale la pena abortar el job
+        logger.warning(f"Could not count clinical histories: {e}")
+        total = None
+    progress = Progress(total, progress_interval, state["processed"], state["updated"])
+
+    def commit(last_id: int, count: int, updates: List[dict]) -> None:
+        if updates and not dry_run:
+            ClinicalHistoryService.update_recommendations(updates)
+        state.update(last_id=last_id, processed=state["processed"] + count, updated=state["updated"] + len(updates))
+        if not dry_run:
+            checkpoint.save(state)
+        progress.advance(count, len(updates))
+
+    chunks = iter_chunks(state["last_id"], chunk_size)
+    try:
+        if workers <= 0:
+            # En el propio proceso: útil para depurar un scorer o si no es serializable
+            _init_worker(scorer, scorer_options)
+            for rows in chunks:
+                commit(rows[-1]["id"], len(rows), _score_chunk(rows))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(scorer, scorer_options)) as pool:
+                # Los bloques se escriben en orden de id para que el checkpoint no salte huecos;
+                # mientras se escribe uno, el pool ya puntúa los siguientes
+                pending: deque = deque()
+                for rows in chunks:
+                    future: Future = pool.submit(_score_chunk, rows)
+                    pending.append((rows[-1]["id"], len(rows), future))
+                    while len(pending) >= workers * 2:
+                        last_id, count, future = pending.popleft()
+                        commit(last_id, count, future.result())
+                while pending:
+                    last_id, count, future = pending.popleft()
+                    commit(last_id, count, future.result())
+    except KeyboardInterrupt:
+        logger.warning(f"Interrupted after id {state['last_id']}; run again with --resume to continue")
+        raise
+
+    state["finished"] = True
+    if not dry_run:
+        checkpoint.save(state)
+    progress.report()
+    return state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scorer", default="dummy", help="Registered scorer name or 'module:Class'.")
+    parser.add_argument("--scorer-options", default="{}", help="JSON object passed to the scorer constructor.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Scoring processes (0 = in-process).")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Histories per read, score and write batch.")
+    parser.add_argument("--checkpoint", default="rescore.checkpoint.json")
+    resume = parser.add_mutually_exclusive_group()
+    resume.add_argument("--resume", action="store_true", help="Continue from the checkpoint.")
+    resume.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start over.")
+    parser.add_argument("--dry-run", action="store_true", help="Score and report, but write nothing.")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress lines.")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        state = run(
+            args.scorer,
+            args.checkpoint,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            resume=args.resume,
+            restart=args.restart,
+            dry_run=args.dry_run,
+            scorer_options=json.loads(args.scorer_options),
+            progress_interval=args.progress_interval,
+        )
+    except KeyboardInterrupt:
+        return 130
+    except (RuntimeError, ValueError) as e:
+        logger.error(str(e))
+        return 1
+    logger.info(f"Done: {state['processed']} processed, {state['updated']} updated")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
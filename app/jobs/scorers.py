@@ -0,0 +1,78 @@
+"""Scorers para el job de recálculo de recomendaciones (`app.jobs.rescore`).
+
+Un scorer recibe un lote de historias clínicas (dicts con las columnas de
+`clinical_histories`) y devuelve, en el mismo orden, un dict con
+`treatment_id` y `treatment_recommendation` por historia. Se instancia una vez
+en cada proceso del pool, así que puede cargar un modelo pesado en `__init__`.
+
+Para usar otro modelo basta con una subclase de `Scorer` y pasarla como
+`--scorer paquete.modulo:Clase`.
+"""
+import importlib
+import inspect
+from abc import ABC, abstractmethod
+from typing import List, Optional, Type
+
+# Columnas que se leen de la base de datos y se pasan a `score`
+FEATURE_COLUMNS = [
+    "family_history", "previous_cancer_history", "stage_at_diagnosis", "tumor_aggressiveness",
+    "colonoscopy_access", "screening_regularity", "diet_type", "bmi", "physical_activity_level",
+    "smoking_status", "alcohol_consumption", "fiber_consumption", "insurance_coverage",
+    "time_to_diagnosis", "treatment_access", "chemotherapy_received", "radiotherapy_received",
+    "surgery_received", "follow_up_adherence", "recurrence", "time_to_recurrence",
+]
+
+
+class Scorer(ABC):
+    # Se guardan en el checkpoint: no se reanuda un recálculo con otro scorer o versión
+    name = "base"
+    version = "1"
+
+    @abstractmethod
+    def score(self, histories: List[dict]) -> List[dict]:
+        """Un dict con `treatment_id` y `treatment_recommendation` por historia, en el mismo orden."""
+
+
+class DummyScorer(Scorer):
+    """Regla determinista por estadio y agresividad, para pruebas del job."""
+
+    name = "dummy"
+    version = "1"
+
+    STAGES = {"I": 0, "II": 1, "III": 2, "IV": 3}
+    AGGRESSIVENESS = {"Low": 0, "Medium": 1, "High": 2}
+
+    def score(self, histories: List[dict]) -> List[dict]:
+        results = []
+        for history in histories:
+            risk = self.STAGES.get(history.get("stage_at_diagnosis"), 0) + self.AGGRESSIVENESS.get(
+                history.get("tumor_aggressiveness"), 0
+            )
+            if history.get("treatment_access") == "Limited":
+                risk = max(risk - 1, 0)
+            level = min(risk, 4) + 1
+            results.append({"treatment_id": level, "treatment_recommendation": f"T{level}"})
+        return results
+
+
+SCORERS = {"dummy": DummyScorer}
+
+
+def resolve_scorer(spec: str) -> Type[Scorer]:
+    """Clase del scorer por nombre registrado (`dummy`) o por ruta `modulo:Clase`."""
+    if spec in SCORERS:
+        return SCORERS[spec]
+    module_name, _, class_name = spec.partition(":")
+    if not class_name:
+        raise ValueError(f"Unknown scorer {spec!r}: use one of {sorted(SCORERS)} or 'module:Class'")
+    scorer_class = getattr(importlib.import_module(module_name), class_name)
+    # Se valida antes de arrancar el pool: un scorer incompleto no debe fallar a mitad del job
+    if not (isinstance(scorer_class, type) and issubclass(scorer_class, Scorer)):
+        raise ValueError(f"Scorer {spec!r} is not a subclass of app.jobs.scorers.Scorer")
+    if inspect.isabstract(scorer_class):
+        raise ValueError(f"Scorer {spec!r} does not implement {', '.join(sorted(scorer_class.__abstractmethods__))}")
+    return scorer_class
+
+
+def load_scorer(spec: str, options: Optional[dict] = None) -> Scorer:
+    return resolve_scorer(spec)(**(options or {}))
@@ -1,7 +1,15 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 from app.routers import patient, clinical_history
+from app.core.admission import AdmissionControlMiddleware
+from app.core.compression import CompressionMiddleware
+from app.core.config import ADMISSION_ENABLED, COMPRESSION_ENABLED, METRICS_ENABLED, TRACING_ENABLED, PROFILING_ENABLED, WARMUP_ENABLED, SIMILARITY_ENABLED
+from app.core.tracing import TracingMiddleware
+from app.core import health, metrics
+from app.core.security import close_auth_client
 
 app = FastAPI(
     title="Oncoassist Patients",
@@ -16,6 +24,11 @@ origins = [
     "http://127.0.0.1:3000",  # desarrollo local alternativo
 ]
 
+# Control de admisión: se registra antes que CORS para que las respuestas 429/503
+# también lleven las cabeceras CORS
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
@@ -24,6 +37,19 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compresión: por fuera de CORS y admisión (también comprime sus respuestas) y por
+# dentro de métricas, que así mide los bytes que salen realmente por la red
+if COMPRESSION_ENABLED:
+    app.add_middleware(CompressionMiddleware)
+
+# Métricas: se registra la última para medir también las peticiones rechazadas
+if METRICS_ENABLED:
+    app.add_middleware(metrics.MetricsMiddleware)
+
+# Trazas: la más externa, para que el request ID y los spans cubran toda la petición
+if TRACING_ENABLED:
+    app.add_middleware(TracingMiddleware)
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
@@ -31,15 +57,62 @@ logger = logging.getLogger(__name__)
 app.include_router(patient.router)
 app.include_router(clinical_history.router)
 
+# Profiler bajo demanda: solo para operadores (X-Admin-Token) y desactivado por defecto.
+# El modo por rutas necesita las trazas activas.
+if PROFILING_ENABLED:
+    from app.routers import profiling
+    app.include_router(profiling.router)
+
 @app.get("/")
 async def root():
     return {"message": "Oncoassist API is running", "status": "ok"}
 
 
+if METRICS_ENABLED:
+    # async para no depender del threadpool, que puede estar saturado justo cuando interesa medir
+    @app.get("/metrics", include_in_schema=False)
+    async def get_metrics():
+        return Response(content=metrics.registry.render(), media_type=metrics.CONTENT_TYPE)
+
+
+# Liveness: solo indica que el proceso responde; no toca upstreams
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    return {"status": "ok"}
+
+
+# Readiness: 503 hasta terminar el warm-up o si algún upstream no responde
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    ready, checks = await run_in_threadpool(health.readiness)
+    return JSONResponse(
+        {"status": "ready" if ready else "not_ready", "checks": checks},
+        status_code=200 if ready else 503,
+    )
+
+
+def start_similarity_index():
+    # Importa similarity_service (y numpy) aquí, en el warm-up, y no al importar la app
+    clinical_history.get_similarity_index().start()
+
+
 @app.on_event("startup")
 async def startup_event():
-    print("API started successfully")
+    if WARMUP_ENABLED:
+        # En el threadpool: el warm-up hace I/O bloqueante (supabase-py y httpx síncronos)
+        hooks = [app.openapi]
+        if SIMILARITY_ENABLED:
+            # El índice de similares se carga en un hilo propio: no retrasa el arranque
+            hooks.append(start_similarity_index)
+        await run_in_threadpool(health.warm_up, *hooks)
+    else:
+        health.skip_warm_up()
+    logger.info("API started successfully")
 
 @app.on_event("shutdown")
 async def shutdown_event():
-    print("API shutting down")
+    index = clinical_history.loaded_similarity_index()
+    if index is not None:
+        index.stop()
+    await run_in_threadpool(close_auth_client)
+    logger.info("API shutting down")
@@ -1,18 +1,29 @@
-from fastapi import APIRouter, HTTPException, status, Depends, Body
-from typing import List
+import logging
+import math
+from fastapi import APIRouter, HTTPException, status, Depends, Body, Query
+from typing import List, Optional
 from httpx import HTTPStatusError, RequestError
 
 from app.schemas.clinical_history import (
     ClinicalHistoryCreate,
     ClinicalHistoryRead,
     ClinicalHistoryUpdate,
+    ClinicalHistorySimilarityQuery,
+    SimilarClinicalHistory,
 )
 from app.services.clinical_history_service import ClinicalHistoryService
+from app.core.config import SIMILARITY_ENABLED, SIMILARITY_MAX_K
 from app.core.security import require_token
+from app.core.resilience import CircuitOpenError
+from app.core.tracing import TracedAPIRoute, TracedJSONResponse
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(
     prefix="/clinical_histories",
     tags=["clinical_histories"],
+    route_class=TracedAPIRoute,
+    default_response_class=TracedJSONResponse,
 )
 
 
@@ -30,6 +41,155 @@ def handle_request_error(e: RequestError):
     raise HTTPException(status_code=503, detail=f"Database not reachable: {str(e)}")
 
 
+def handle_circuit_open(e: CircuitOpenError):
+    raise HTTPException(
+        status_code=503,
+        detail="Database unavailable",
+        headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+    )
+
+
+def handle_unexpected_error(e: Exception):
+    # .single() sin filas: postgrest lanza APIError con el código PGRST116
+    if getattr(e, "code", None) == "PGRST116":
+        raise HTTPException(status_code=404, detail="Clinical history not found")
+    raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+def handle_index_warming_up(e: Exception):
+    raise HTTPException(status_code=503, detail="Similarity index warming up", headers={"Retry-After": "5"})
+
+
+def ensure_similarity_enabled():
+    if not SIMILARITY_ENABLED:
+        raise HTTPException(status_code=503, detail="Similarity search is disabled")
+
+
+# Índice de similares del worker; None hasta el primer uso
+_similarity_index = None
+
+
+def get_similarity_index():
+    """Devuelve el índice de similares, importando `similarity_service` en el primer uso.
+
+    El servicio depende de numpy (~140 ms de import): se importa aquí y no al
+    importar la app, igual que `supabase` en `get_supabase`.
+    """
+    global _similarity_index
+    if _similarity_index is None:
+        from app.services.similarity_service import similarity_index
+        _similarity_index = similarity_index
+    return _similarity_index
+
+
+def loaded_similarity_index():
+    """El índice si ya se cargó en este worker; si no, no hay nada que mantener al día."""
+    return _similarity_index if SIMILARITY_ENABLED else None
+
+
+def update_similarity_index(upsert: Optional[dict] = None, removed_id: Optional[int] = None) -> None:
+    """Lleva al índice una escritura ya confirmada en la base de datos.
+
+    Va fuera del `try` de la escritura: si fallara allí, el cliente recibiría un
+    500 por una historia ya guardada y, al reintentar, la duplicaría. El fallo
+    se registra y la sincronización periódica (o la reconstrucción, para los
+    borrados) corrige el índice.
+    """
+    index = loaded_similarity_index()
+    if index is None:
+        return
+    try:
+        if upsert is not None:
+            index.upsert_rows([upsert])
+        if removed_id is not None:
+            index.remove(removed_id)
+    except Exception as e:
+        logger.warning(f"Could not update similarity index: {e!r}")
+
+
+@router.post(
+    "/similar",
+    response_model=List[SimilarClinicalHistory],
+    responses={
+        200: {"description": "OK"},
+        400: {"description": "At least one feature is required"},
+        401: {"description": "Authorization required"},
+        403: {"description": "Invalid token"},
+        503: {"description": "Database or Auth service unavailable, or similarity index warming up"},
+    },
+)
+def find_similar_histories(
+    query: ClinicalHistorySimilarityQuery,
+    k: int = Query(20, ge=1, le=SIMILARITY_MAX_K),
+    token_info: dict = Depends(require_token),
+):
+    """Find the k past clinical histories most similar to a case, with their outcomes."""
+    ensure_similarity_enabled()
+    from app.services.similarity_service import IndexWarmingUpError
+    features = query.model_dump(mode="json", exclude_none=True)
+    if not features:
+        raise HTTPException(status_code=400, detail="At least one feature is required")
+    index = get_similarity_index()
+    try:
+        return index.search(features, k)
+    except IndexWarmingUpError as e:
+        handle_index_warming_up(e)
+    except HTTPStatusError as e:
+        handle_http_error(e)
+    except RequestError as e:
+        handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get(
+    "/{history_id}/similar",
+    response_model=List[SimilarClinicalHistory],
+    responses={
+        200: {"description": "OK"},
+        401: {"description": "Authorization required"},
+        403: {"description": "Invalid token"},
+        404: {"description": "Clinical history not found"},
+        503: {"description": "Database or Auth service unavailable, or similarity index warming up"},
+    },
+)
+def get_similar_histories(
+    history_id: int,
+    k: int = Query(20, ge=1, le=SIMILARITY_MAX_K),
+    token_info: dict = Depends(require_token),
+):
+    """Find the k clinical histories most similar to an existing one (excluding itself)."""
+    ensure_similarity_enabled()
+    from app.services.similarity_service import IndexWarmingUpError
+    try:
+        history = ClinicalHistoryService.get_clinical_history(history_id)
+    except HTTPStatusError as e:
+        handle_http_error(e)
+    except RequestError as e:
+        handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
+    except Exception as e:
+        handle_unexpected_error(e)
+    if not history:
+        raise HTTPException(status_code=404, detail="Clinical history not found")
+    index = get_similarity_index()
+    try:
+        return index.search(history, k, exclude_id=history_id)
+    except IndexWarmingUpError as e:
+        handle_index_warming_up(e)
+    except HTTPStatusError as e:
+        handle_http_error(e)
+    except RequestError as e:
+        handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
 @router.get(
     "/{history_id}",
     response_model=ClinicalHistoryRead,
@@ -52,6 +212,8 @@ def get_clinical_history(history_id: int, token_info: dict = Depends(require_tok
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -74,6 +236,8 @@ def get_histories_by_document(document_id: str, token_info: dict = Depends(requi
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -153,13 +317,16 @@ def create_clinical_history(
         history = ClinicalHistoryService.create_clinical_history(clinical_history_in)
         if not history:
             raise HTTPException(status_code=400, detail="Could not create clinical history")
-        return history
     except HTTPStatusError as e:
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    update_similarity_index(upsert=history)
+    return history
 
 
 @router.patch(
@@ -180,13 +347,16 @@ def update_clinical_history(history_id: int, clinical_history_in: ClinicalHistor
         updated = ClinicalHistoryService.update_clinical_history(history_id, clinical_history_in)
         if not updated:
             raise HTTPException(status_code=404, detail="Clinical history not found")
-        return updated
     except HTTPStatusError as e:
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    update_similarity_index(upsert=updated)
+    return updated
 
 
 @router.delete(
@@ -206,10 +376,13 @@ def delete_clinical_history(history_id: int, token_info: dict = Depends(require_
         deleted = ClinicalHistoryService.delete_clinical_history(history_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Clinical history not found")
-        return None
     except HTTPStatusError as e:
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+    update_similarity_index(removed_id=history_id)
+    return None
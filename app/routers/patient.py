@@ -1,19 +1,26 @@
-from fastapi import APIRouter, HTTPException, status, Depends
-from typing import List
+import math
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from typing import List, Optional
 from httpx import HTTPStatusError, RequestError
 
 from app.schemas.patient import (
     PatientCreate,
     PatientRead,
     PatientUpdate,
+    PatientSummaryPage,
 )
+from app.schemas.clinical_history import Recurrence, StageAtDiagnosis
 from app.services.patient_service import PatientService
 from app.core.security import require_token
+from app.core.resilience import CircuitOpenError
+from app.core.tracing import TracedAPIRoute, TracedJSONResponse
 from fastapi import Body
 
 router = APIRouter(
     prefix="/patients",
     tags=["patients"],
+    route_class=TracedAPIRoute,
+    default_response_class=TracedJSONResponse,
 )
 
 
@@ -33,6 +40,14 @@ def handle_request_error(e: RequestError):
     raise HTTPException(status_code=503, detail=f"Database not reachable: {str(e)}")
 
 
+def handle_circuit_open(e: CircuitOpenError):
+    raise HTTPException(
+        status_code=503,
+        detail="Database unavailable",
+        headers={"Retry-After": str(max(math.ceil(e.retry_after), 1))},
+    )
+
+
 @router.post(
     "/",
     response_model=PatientRead,
@@ -98,6 +113,47 @@ def create_patient(
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+
+@router.get(
+    "/summary",
+    response_model=PatientSummaryPage,
+    responses={
+        200: {"description": "OK"},
+        401: {"description": "Authorization required"},
+        403: {"description": "Invalid token"},
+        503: {"description": "Database or Auth service unavailable"},
+    },
+)
+def list_patient_summaries(
+    after: Optional[str] = Query(None, description="document_id of the last patient of the previous page."),
+    limit: int = Query(100, ge=1, le=1000),
+    stage_at_diagnosis: Optional[StageAtDiagnosis] = None,
+    recurrence: Optional[Recurrence] = None,
+    token_info: dict = Depends(require_token),
+):
+    """List per-patient summaries (latest stage, aggressiveness, recurrence and history count) ordered by document ID."""
+    try:
+        # Se pide una fila de más para saber si hay otra página sin una consulta adicional
+        rows = PatientService.list_patient_summaries(
+            after,
+            limit + 1,
+            stage_at_diagnosis.value if stage_at_diagnosis else None,
+            recurrence.value if recurrence else None,
+        )
+        items = rows[:limit]
+        next_after = items[-1]["document_id"] if len(rows) > limit else None
+        return {"items": items, "next_after": next_after}
+    except HTTPStatusError as e:
+        handle_http_error(e)
+    except RequestError as e:
+        handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -124,6 +180,8 @@ def get_patient(document_id: str, token_info: dict = Depends(require_token)):
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -146,6 +204,8 @@ def list_patients(page: int = None, page_size: int = None, token_info: dict = De
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -173,6 +233,8 @@ def update_patient(document_id: str, patient_in: PatientUpdate, token_info: dict
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
@@ -199,5 +261,7 @@ def delete_patient(document_id: str, token_info: dict = Depends(require_token)):
         handle_http_error(e)
     except RequestError as e:
         handle_request_error(e)
+    except CircuitOpenError as e:
+        handle_circuit_open(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
@@ -0,0 +1,111 @@
+from fastapi import APIRouter, HTTPException, status, Depends, Query
+from fastapi.responses import PlainTextResponse
+from typing import List, Optional
+
+from app.core.profiling import profiler, ProfilerBusyError, MODE_PROCESS, MODE_REQUESTS, FINISHED, MIN_INTERVAL_MS
+from app.core.security import require_admin_token
+
+router = APIRouter(
+    prefix="/admin/profiling",
+    tags=["admin"],
+    dependencies=[Depends(require_admin_token)],
+)
+
+
+def get_session_or_404(session_id: str):
+    session = profiler.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Profiling session not found")
+    return session
+
+
+def handle_busy(e: ProfilerBusyError):
+    raise HTTPException(status_code=409, detail=f"Profiling session already running: {e}")
+
+
+@router.post(
+    "/process",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Accepted"},
+        401: {"description": "Admin token required"},
+        403: {"description": "Invalid admin token"},
+        409: {"description": "Profiling session already running"},
+    },
+)
+async def profile_process(
+    seconds: float = Query(..., gt=0, description="Duration of the profile in seconds."),
+    interval_ms: Optional[float] = Query(None, ge=MIN_INTERVAL_MS, description="Sampling interval in milliseconds."),
+):
+    """Profile every thread of this worker process for the given time."""
+    try:
+        kwargs = {"interval_ms": interval_ms} if interval_ms is not None else {}
+        return profiler.start(MODE_PROCESS, seconds=seconds, **kwargs).to_dict()
+    except ProfilerBusyError as e:
+        handle_busy(e)
+
+
+@router.post(
+    "/requests",
+    status_code=status.HTTP_202_ACCEPTED,
+    responses={
+        202: {"description": "Accepted"},
+        401: {"description": "Admin token required"},
+        403: {"description": "Invalid admin token"},
+        409: {"description": "Profiling session already running"},
+    },
+)
+async def profile_requests(
+    route: str = Query(..., description="Route template, e.g. /patients/{document_id}."),
+    count: int = Query(..., gt=0, description="Number of matching requests to profile."),
+    method: Optional[str] = Query(None, description="HTTP method to match (any if omitted)."),
+    seconds: Optional[float] = Query(None, gt=0, description="Maximum duration of the profile."),
+    interval_ms: Optional[float] = Query(None, ge=MIN_INTERVAL_MS, description="Sampling interval in milliseconds."),
+):
+    """Profile the next N requests matching a route."""
+    try:
+        kwargs = {"interval_ms": interval_ms} if interval_ms is not None else {}
+        return profiler.start(
+            MODE_REQUESTS, seconds=seconds, route=route, method=method, count=count, **kwargs
+        ).to_dict()
+    except ProfilerBusyError as e:
+        handle_busy(e)
+
+
+@router.get("/", response_model=List[dict])
+async def list_profiles():
+    """List running and recently finished profiling sessions."""
+    return [session.to_dict() for session in profiler.sessions()]
+
+
+@router.get("/{session_id}")
+async def get_profile(session_id: str):
+    """Get the status of a profiling session."""
+    return get_session_or_404(session_id).to_dict()
+
+
+@router.delete("/{session_id}")
+def stop_profile(session_id: str):
+    """Stop a running profiling session."""
+    get_session_or_404(session_id)
+    return profiler.stop(session_id).to_dict()
+
+
+@router.get(
+    "/{session_id}/collapsed",
+    response_class=PlainTextResponse,
+    responses={
+        200: {"description": "Collapsed stacks, one 'frame;frame;frame count' per line"},
+        404: {"description": "Profiling session not found"},
+        409: {"description": "Profiling session still running"},
+    },
+)
+async def download_profile(session_id: str):
+    """Download the result as collapsed stacks (flamegraph.pl / speedscope input)."""
+    session = get_session_or_404(session_id)
+    if session.state != FINISHED:
+        raise HTTPException(status_code=409, detail="Profiling session still running")
+    return PlainTextResponse(
+        session.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{session.id}.collapsed"'},
+    )
@@ -224,4 +224,49 @@ class ClinicalHistoryRead(ClinicalHistoryBase):
                 "created": "2025-09-23T10:15:30Z",
                 "edited": "2025-09-23T10:15:30Z",
             }
-        }
\ No newline at end of file
+        }
+
+
+class ClinicalHistorySimilarityQuery(BaseModel):
+    """Rasgos del caso a comparar; los campos omitidos no cuentan en la distancia."""
+    family_history: Optional[FamilyHistory] = None
+    previous_cancer_history: Optional[PreviousCancerHistory] = None
+    stage_at_diagnosis: Optional[StageAtDiagnosis] = None
+    tumor_aggressiveness: Optional[TumorAggressiveness] = None
+    colonoscopy_access: Optional[ColonoscopyAccess] = None
+    screening_regularity: Optional[ScreeningRegularity] = None
+    diet_type: Optional[DietType] = None
+    bmi: Optional[float] = Field(None, ge=0, le=100)
+    physical_activity_level: Optional[PhysicalActivityLevel] = None
+    smoking_status: Optional[SmokingStatus] = None
+    alcohol_consumption: Optional[AlcoholConsumption] = None
+    fiber_consumption: Optional[FiberConsumption] = None
+    insurance_coverage: Optional[InsuranceCoverage] = None
+    time_to_diagnosis: Optional[TimeToDiagnosis] = None
+    treatment_access: Optional[TreatmentAccess] = None
+    chemotherapy_received: Optional[ChemotherapyReceived] = None
+    radiotherapy_received: Optional[RadiotherapyReceived] = None
+    surgery_received: Optional[SurgeryReceived] = None
+    follow_up_adherence: Optional[FollowUpAdherence] = None
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "stage_at_diagnosis": "III",
+                "tumor_aggressiveness": "High",
+                "family_history": "Yes",
+                "bmi": 31.5,
+                "smoking_status": "Former",
+                "treatment_access": "Adequate",
+                "follow_up_adherence": "Good",
+            }
+        }
+
+
+class SimilarClinicalHistory(BaseModel):
+    id: int = Field(..., description="ID of the matching clinical history.")
+    document_id: str = Field(..., description="Document ID of the matching patient.")
+    distance: float = Field(..., description="Distance to the query over the provided features (0 = identical).")
+    recurrence: Optional[Recurrence] = Field(None, description="Observed recurrence outcome.")
+    time_to_recurrence: Optional[int] = Field(None, description="Days until recurrence occurred.")
+    treatment_recommendation: Optional[str] = Field(None, description="AI treatment recommendation name.")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, EmailStr, Field
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
 from enum import Enum
 
@@ -42,4 +42,21 @@ class PatientUpdate(BaseModel):
 
 class PatientRead(PatientBase):
     created: datetime = Field(..., description="Date and time when the patient was created.")
-    edited: datetime = Field(..., description="Date and time when the patient was last edited.")
\ No newline at end of file
+    edited: datetime = Field(..., description="Date and time when the patient was last edited.")
+
+
+class PatientSummary(BaseModel):
+    document_id: str = Field(..., description="Unique identification number of the patient.")
+    name: str = Field(..., description="Full name of the patient.")
+    history_count: int = Field(..., description="Number of clinical histories of the patient.")
+    latest_history_id: Optional[int] = Field(None, description="ID of the most recent clinical history.")
+    latest_stage_at_diagnosis: Optional[str] = Field(None, description="Stage at diagnosis in the most recent clinical history.")
+    latest_tumor_aggressiveness: Optional[str] = Field(None, description="Tumor aggressiveness in the most recent clinical history.")
+    latest_recurrence: Optional[str] = Field(None, description="Recurrence status in the most recent clinical history.")
+    latest_history_edited: Optional[datetime] = Field(None, description="Last edit of the most recent clinical history.")
+    has_recurrence: bool = Field(..., description="Whether any clinical history of the patient records a recurrence.")
+
+
+class PatientSummaryPage(BaseModel):
+    items: List[PatientSummary]
+    next_after: Optional[str] = Field(None, description="Pass as `after` to get the next page; null on the last page.")
@@ -1,5 +1,7 @@
 from typing import List, Optional
-from app.core.database import supabase
+from app.core.database import get_supabase
+from app.core.resilience import circuit_protected
+from app.core.metrics import observe_upstream
 from app.schemas.clinical_history import ClinicalHistoryCreate, ClinicalHistoryUpdate
 
 
@@ -7,9 +9,11 @@ class ClinicalHistoryService:
     TABLE_NAME = "clinical_histories"
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
     def get_clinical_history(history_id: int) -> Optional[dict]:
         response = (
-            supabase.table(ClinicalHistoryService.TABLE_NAME)
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
             .select("*")
             .eq("id", history_id)
             .single()
@@ -18,9 +22,25 @@ class ClinicalHistoryService:
         return response.data if response.data else None
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
+    def get_clinical_histories_by_ids(history_ids: List[int], columns: str = "*") -> List[dict]:
+        if not history_ids:
+            return []
+        response = (
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
+            .select(columns)
+            .in_("id", history_ids)
+            .execute()
+        )
+        return response.data or []
+
+    @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
     def get_clinical_histories_by_document(document_id: str) -> List[dict]:
         response = (
-            supabase.table(ClinicalHistoryService.TABLE_NAME)
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
             .select("*")
             .eq("document_id", document_id)   # cedula del paciente
             .execute()
@@ -28,9 +48,48 @@ class ClinicalHistoryService:
         return response.data or []
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
+    def scan_clinical_histories(columns: str, after_id: int, limit: int, edited_since: Optional[str] = None) -> List[dict]:
+        # Recorrido por keyset sobre la PK: cada página cuesta lo mismo sin importar lo lejos que esté
+        query = (
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
+            .select(columns)
+            .gt("id", after_id)
+        )
+        if edited_since is not None:
+            query = query.gte("edited", edited_since)
+        response = query.order("id").limit(limit).execute()
+        return response.data or []
+
+    @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
+    def count_clinical_histories(after_id: int = 0) -> int:
+        response = (
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
+            .select("id", count="exact")
+            .gt("id", after_id)
+            .limit(1)
+            .execute()
+        )
+        return response.count or 0
+
+    @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
+    def update_recommendations(updates: List[dict]) -> int:
+        # Un solo UPDATE por lote (función rescore_clinical_histories en create_tables.sql).
+        # Reaplicar el mismo lote deja el mismo resultado, así que se puede reintentar.
+        response = get_supabase().rpc("rescore_clinical_histories", {"updates": updates}).execute()
+        return response.data or 0
+
+    @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database")
     def create_clinical_history(clinical_history_in: ClinicalHistoryCreate) -> dict:
         response = (
-            supabase.table(ClinicalHistoryService.TABLE_NAME)
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
             .insert(clinical_history_in.model_dump())
             .execute()
         )
@@ -39,9 +98,11 @@ class ClinicalHistoryService:
         return {}
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database")
     def update_clinical_history(history_id: int, clinical_history_in: ClinicalHistoryUpdate) -> Optional[dict]:
         response = (
-            supabase.table(ClinicalHistoryService.TABLE_NAME)
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
             .update(clinical_history_in.model_dump(exclude_unset=True))
             .eq("id", history_id)
             .execute()
@@ -49,9 +110,11 @@ class ClinicalHistoryService:
         return response.data[0] if response.data else None
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database")
     def delete_clinical_history(history_id: int) -> bool:
         response = (
-            supabase.table(ClinicalHistoryService.TABLE_NAME)
+            get_supabase().table(ClinicalHistoryService.TABLE_NAME)
             .delete()
             .eq("id", history_id)
             .execute()
@@ -1,26 +1,47 @@
 from typing import List, Optional
-from app.core.database import supabase
+from app.core.database import get_supabase
+from app.core.resilience import circuit_protected
+from app.core.metrics import observe_upstream
+from app.core.config import PATIENT_CACHE_TTL_SECONDS
+from app.core.shared_cache import cache_delete, cache_get, cache_set
 from app.schemas.patient import PatientCreate, PatientUpdate
 
 
 class PatientService:
     TABLE_NAME = "patient"
+    SUMMARY_TABLE_NAME = "patient_summary"
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database")
     def create_patient(patient: PatientCreate) -> Optional[dict]:
-        res = supabase.table(PatientService.TABLE_NAME).insert(patient.model_dump()).execute()
+        res = get_supabase().table(PatientService.TABLE_NAME).insert(patient.model_dump()).execute()
         if res.data:
             return res.data[0]
         return None
 
     @staticmethod
     def get_patient(document_id: str) -> Optional[dict]:
-        res = supabase.table(PatientService.TABLE_NAME).select("*").eq("document_id", document_id).single().execute()
+        # Registros calientes compartidos entre workers; las escrituras los invalidan
+        patient = cache_get("patient", document_id)
+        if patient is None:
+            patient = PatientService._fetch_patient(document_id)
+            if patient:
+                cache_set("patient", document_id, patient, PATIENT_CACHE_TTL_SECONDS)
+        return patient
+
+    @staticmethod
+    @observe_upstream("database", "PatientService.get_patient")
+    @circuit_protected("database", idempotent=True)
+    def _fetch_patient(document_id: str) -> Optional[dict]:
+        res = get_supabase().table(PatientService.TABLE_NAME).select("*").eq("document_id", document_id).single().execute()
         return res.data
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
     def list_patients(page: int = None, page_size: int = None) -> List[dict]:
-        query = supabase.table(PatientService.TABLE_NAME).select("*")
+        query = get_supabase().table(PatientService.TABLE_NAME).select("*")
         if page is not None and page_size is not None:
             start = (page - 1) * page_size
             end = start + page_size - 1
@@ -29,11 +50,37 @@ class PatientService:
         return res.data or []
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database", idempotent=True)
+    def list_patient_summaries(
+        after: Optional[str],
+        limit: int,
+        stage_at_diagnosis: Optional[str] = None,
+        recurrence: Optional[str] = None,
+    ) -> List[dict]:
+        # Keyset sobre la PK: cada página es un único recorrido del índice, sin OFFSET
+        query = get_supabase().table(PatientService.SUMMARY_TABLE_NAME).select("*")
+        if after is not None:
+            query = query.gt("document_id", after)
+        if stage_at_diagnosis is not None:
+            query = query.eq("latest_stage_at_diagnosis", stage_at_diagnosis)
+        if recurrence is not None:
+            query = query.eq("latest_recurrence", recurrence)
+        res = query.order("document_id").limit(limit).execute()
+        return res.data or []
+
+    @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database")
     def update_patient(document_id: str, patient_update: PatientUpdate) -> Optional[dict]:
-        res = supabase.table(PatientService.TABLE_NAME).update(patient_update.model_dump(exclude_unset=True)).eq("document_id", document_id).execute()
+        res = get_supabase().table(PatientService.TABLE_NAME).update(patient_update.model_dump(exclude_unset=True)).eq("document_id", document_id).execute()
+        cache_delete("patient", document_id)
         return res.data[0] if res.data else None
 
     @staticmethod
+    @observe_upstream("database")
+    @circuit_protected("database")
     def delete_patient(document_id: str) -> bool:
-        res = supabase.table(PatientService.TABLE_NAME).delete().eq("document_id", document_id).execute()
+        res = get_supabase().table(PatientService.TABLE_NAME).delete().eq("document_id", document_id).execute()
+        cache_delete("patient", document_id)
         return bool(res.data)
@@ -0,0 +1,495 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import (
+    SIMILARITY_INDEX,
+    SIMILARITY_PARTITION_THRESHOLD,
+    SIMILARITY_PARTITIONS,
+    SIMILARITY_PROBES,
+    SIMILARITY_SYNC_SECONDS,
+    SIMILARITY_SYNC_OVERLAP_SECONDS,
+    SIMILARITY_REBUILD_SECONDS,
+)
+from app.core.tracing import span
+from app.services.clinical_history_service import ClinicalHistoryService
+
+logger = logging.getLogger(__name__)
+
+# Rasgos del caso clínico que entran en el vector. Los resultados (recurrence,
+# time_to_recurrence, treatment_recommendation) y treatment_id no se codifican:
+# son lo que se devuelve de los casos parecidos.
+ORDINAL_FEATURES = {
+    "stage_at_diagnosis": ["I", "II", "III", "IV"],
+    "tumor_aggressiveness": ["Low", "Medium", "High"],
+    "screening_regularity": ["Regular", "Irregular", "Never"],
+    "physical_activity_level": ["Low", "Medium", "High"],
+    "smoking_status": ["Never", "Former", "Current"],
+    "alcohol_consumption": ["Low", "Medium", "High"],
+    "fiber_consumption": ["Low", "Medium", "High"],
+}
+# Rasgos de dos valores: (valor codificado como 1, valor codificado como 0)
+BINARY_FEATURES = {
+    "family_history": ("Yes", "No"),
+    "previous_cancer_history": ("Yes", "No"),
+    "colonoscopy_access": ("Yes", "No"),
+    "insurance_coverage": ("Yes", "No"),
+    "time_to_diagnosis": ("Delayed", "Timely"),
+    "treatment_access": ("Adequate", "Limited"),
+    "chemotherapy_received": ("Yes", "No"),
+    "radiotherapy_received": ("Yes", "No"),
+    "surgery_received": ("Yes", "No"),
+    "follow_up_adherence": ("Good", "Poor"),
+}
+CATEGORICAL_FEATURES = {
+    "diet_type": ["Vegetarian", "Vegan", "Omnivore", "Mediterranean", "Western"],
+}
+# BMI centrado en 25 y escalado para que 10 puntos pesen como un nivel completo de un ordinal
+BMI_CENTER, BMI_SCALE = 25.0, 10.0
+
+# Los resultados no se guardan en el índice: se piden a la base de datos solo para el top-k
+OUTCOME_COLUMNS = ["id", "document_id", "recurrence", "time_to_recurrence", "treatment_recommendation"]
+SCAN_COLUMNS = ["id"] + list(ORDINAL_FEATURES) + list(BINARY_FEATURES) + list(CATEGORICAL_FEATURES) + ["bmi", "edited"]
+SCAN_PAGE_SIZE = 1000
+# Espera antes de reintentar la primera construcción si falla
+BUILD_RETRY_SECONDS = 5.0
+
+
+def _build_layout() -> Tuple[List[Tuple[str, slice]], int]:
+    layout, width = [], 0
+    for name in ORDINAL_FEATURES:
+        layout.append((name, slice(width, width + 1)))
+        width += 1
+    for name in BINARY_FEATURES:
+        layout.append((name, slice(width, width + 1)))
+        width += 1
+    for name, values in CATEGORICAL_FEATURES.items():
+        layout.append((name, slice(width, width + len(values))))
+        width += len(values)
+    layout.append(("bmi", slice(width, width + 1)))
+    return layout, width + 1
+
+
+FEATURE_LAYOUT, DIMENSIONS = _build_layout()
+_SLICES = dict(FEATURE_LAYOUT)
+
+
+def _lookup(values: List[str], scale: float) -> Dict[str, float]:
+    return {value: i * scale for i, value in enumerate(values)}
+
+
+_SCALAR_CODES = {
+    **{name: _lookup(values, 1 / (len(values) - 1)) for name, values in ORDINAL_FEATURES.items()},
+    **{name: {positive: 1.0, negative: 0.0} for name, (positive, negative) in BINARY_FEATURES.items()},
+}
+_CATEGORY_CODES = {name: {value: i for i, value in enumerate(values)} for name, values in CATEGORICAL_FEATURES.items()}
+# Una categoría distinta aporta distancia 1 (0.5 + 0.5 en dos columnas del one-hot)
+_ONE_HOT = 0.5 ** 0.5
+
+
+def encode(rows: Iterable[dict]) -> Tuple[np.ndarray, np.ndarray]:
+    """Codifica historias clínicas en vectores (n, DIMENSIONS) más una máscara de rasgos presentes.
+
+    Ordinales en [0, 1], binarios 0/1, categóricos one-hot y BMI escalado.
+    Los valores ausentes quedan a 0 con máscara False. Espera los valores como
+    texto (filas de la base de datos o `model_dump(mode="json")`). Se recorre por columnas
+    para que cada rasgo sea una sola pasada con búsquedas en diccionario.
+    """
+    rows = list(rows)
+    n = len(rows)
+    vectors = np.zeros((n, DIMENSIONS), dtype=np.float32)
+    mask = np.zeros((n, DIMENSIONS), dtype=bool)
+    nan = float("nan")
+    for name, codes in _SCALAR_CODES.items():
+        column = _SLICES[name].start
+        values = np.fromiter((codes.get(row.get(name), nan) for row in rows), dtype=np.float32, count=n)
+        present = ~np.isnan(values)
+        vectors[present, column] = values[present]
+        mask[:, column] = present
+    for name, codes in _CATEGORY_CODES.items():
+        columns = _SLICES[name]
+        positions = np.fromiter((codes.get(row.get(name), -1) for row in rows), dtype=np.int64, count=n)
+        present = positions >= 0
+        vectors[np.flatnonzero(present), columns.start + positions[present]] = _ONE_HOT
+        mask[present, columns] = True
+    bmi = np.fromiter(
+        (nan if row.get("bmi") is None else float(row["bmi"]) for row in rows), dtype=np.float32, count=n
+    )
+    present = ~np.isnan(bmi)
+    column = _SLICES["bmi"].start
+    vectors[present, column] = (bmi[present] - BMI_CENTER) / BMI_SCALE
+    mask[:, column] = present
+    return vectors, mask
+
+
+def _impute(vectors: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    # Rasgos ausentes en la historia almacenada: valor neutro (0.5 en ordinales y
+    # binarios, reparto uniforme en one-hot, BMI en el centro)
+    neutral = np.full(DIMENSIONS, 0.5, dtype=np.float32)
+    for name, values in CATEGORICAL_FEATURES.items():
+        neutral[_SLICES[name]] = _ONE_HOT / len(values)
+    neutral[_SLICES["bmi"]] = 0.0
+    return np.where(mask, vectors, neutral)
+
+
+class BruteForceIndex:
+    """Índice exacto: todas las distancias con dos productos matriz-vector.
+
+    Con pesos w (la máscara de la consulta), sum(w * (x - q)^2) se expande como
+    x²·w - 2·x·(w*q) + q²·w, de modo que el coste es O(n·d) en BLAS. Las filas
+    viven en arrays con capacidad doblada; borrar mueve la última fila al hueco.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.vectors = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        self.squares = np.zeros((capacity, DIMENSIONS), dtype=np.float32)
+        self.size = 0
+        self._rows: Dict[int, int] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ("ids", "vectors", "squares"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def upsert(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        self._grow(self.size + len(ids))
+        rows = np.empty(len(ids), dtype=np.int64)
+        for i, history_id in enumerate(ids.tolist()):
+            row = self._rows.get(history_id)
+            if row is None:
+                row = self._rows[history_id] = self.size
+                self.size += 1
+            rows[i] = row
+        # Asignación en bloque: en la carga inicial son todas filas nuevas y consecutivas
+        self.ids[rows] = ids
+        self.vectors[rows] = vectors
+        self.squares[rows] = vectors * vectors
+
+    def remove(self, history_id: int) -> bool:
+        row = self._rows.pop(history_id, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            moved = int(self.ids[last])
+            self.ids[row] = moved
+            self.vectors[row] = self.vectors[last]
+            self.squares[row] = self.squares[last]
+            self._rows[moved] = row
+        self.size = last
+        return True
+
+    def distances(self, query: np.ndarray, weights: np.ndarray) -> np.ndarray:
+        n = self.size
+        weighted = query * weights
+        distances = self.squares[:n] @ weights - 2 * (self.vectors[:n] @ weighted) + float(query @ weighted)
+        # Errores de redondeo pueden dar valores ligeramente negativos
+        return np.maximum(distances, 0.0)
+
+    def search(self, query: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if self.size == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        distances = self.distances(query, weights)
+        k = min(k, self.size)
+        top = np.argpartition(distances, k - 1)[:k]
+        top = top[np.argsort(distances[top], kind="stable")]
+        return self.ids[top].copy(), distances[top]
+
+
+class PartitionedIndex:
+    """Índice aproximado tipo IVF: k-means sobre los vectores y búsqueda en las `probes` particiones más cercanas.
+
+    Las altas y cambios se asignan al centroide más cercano sin reentrenar; el
+    reentrenamiento ocurre en cada reconstrucción completa.
+    """
+
+    def __init__(self, vectors: np.ndarray, ids: np.ndarray, partitions: int, probes: int, seed: int = 0):
+        partitions = max(1, min(partitions, len(ids)))
+        self.probes = probes
+        self.centroids = self._kmeans(vectors, partitions, seed)
+        self.partitions = [BruteForceIndex() for _ in range(len(self.centroids))]
+        self._assignment: Dict[int, int] = {}
+        self.upsert(ids, vectors)
+
+    @staticmethod
+    def _kmeans(vectors: np.ndarray, partitions: int, seed: int, iterations: int = 10, sample: int = 50_000) -> np.ndarray:
+        rng = np.random.default_rng(seed)
+        if len(vectors) > sample:
+            vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+        centroids = vectors[rng.choice(len(vectors), partitions, replace=False)].copy()
+        for _ in range(iterations):
+            labels = PartitionedIndex._nearest(vectors, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, vectors)
+            counts = np.bincount(labels, minlength=partitions)
+            # Los centroides sin miembros se quedan donde estaban
+            filled = counts > 0
+            centroids[filled] = sums[filled] / counts[filled, None]
+        return centroids
+
+    @staticmethod
+    def _nearest(vectors: np.ndarray, centroids: np.ndarray, block: int = 8192) -> np.ndarray:
+        # Por bloques para no materializar la matriz completa filas x centroides
+        squares = (centroids * centroids).sum(axis=1)
+        labels = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block):
+            chunk = vectors[start:start + block]
+            labels[start:start + block] = (squares - 2 * chunk @ centroids.T).argmin(axis=1)
+        return labels
+
+    def __len__(self) -> int:
+        return sum(len(partition) for partition in self.partitions)
+
+    def upsert(self, ids: np.ndarray, vectors: np.ndarray) -> None:
+        labels = self._nearest(vectors, self.centroids)
+        if self._assignment:
+            # Una historia editada puede cambiar de partición
+            for history_id, label in zip(ids.tolist(), labels.tolist()):
+                previous = self._assignment.get(history_id)
+                if previous is not None and previous != label:
+                    self.partitions[previous].remove(history_id)
+        self._assignment.update(zip(ids.tolist(), labels.tolist()))
+        order = np.argsort(labels, kind="stable")
+        groups, starts = np.unique(labels[order], return_index=True)
+        for label, group in zip(groups.tolist(), np.split(order, starts[1:])):
+            self.partitions[label].upsert(ids[group], vectors[group])
+
+    def remove(self, history_id: int) -> bool:
+        label = self._assignment.pop(history_id, None)
+        return label is not None and self.partitions[label].remove(history_id)
+
+    def search(self, query: np.ndarray, weights: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Las particiones se ordenan con la misma distancia ponderada que las filas
+        centroid_distances = ((self.centroids - query) ** 2) @ weights
+        probes = np.argsort(centroid_distances)[:self.probes]
+        found_ids, found_distances = [], []
+        for label in probes:
+            ids, distances = self.partitions[label].search(query, weights, k)
+            found_ids.append(ids)
+            found_distances.append(distances)
+        ids = np.concatenate(found_ids)
+        distances = np.concatenate(found_distances)
+        top = np.argsort(distances, kind="stable")[:k]
+        return ids[top], distances[top]
+
+
+class IndexWarmingUpError(Exception):
+    """El índice aún no se ha construido: la búsqueda no puede responder todavía."""
+
+
+class SimilarityIndex:
+    """Índice en memoria de historias clínicas para buscar casos parecidos.
+
+    Lo construye y lo mantiene un hilo en segundo plano que arranca en el
+    warm-up (o con la primera búsqueda si el warm-up está desactivado), nunca
+    una petición: hasta la primera construcción las búsquedas fallan con
+    `IndexWarmingUpError`. Las escrituras de este worker lo actualizan al
+    instante y, cada `SIMILARITY_SYNC_SECONDS`, el hilo pide a la base de datos
+    las filas editadas desde la última sincronización para recoger las de otros
+    workers. Los borrados hechos por otros procesos se recogen en la
+    reconstrucción completa cada `SIMILARITY_REBUILD_SECONDS`; mientras dura, se
+    sigue usando el índice anterior hasta el intercambio.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._index = None
+        self._watermark: Optional[str] = None
+        self._built_at = 0.0
+        # Borrados que llegan mientras se reconstruye, para aplicarlos al índice nuevo
+        self._removed_during_build: Optional[set] = None
+
+    @property
+    def kind(self) -> Optional[str]:
+        if self._index is None:
+            return None
+        return "partitioned" if isinstance(self._index, PartitionedIndex) else "brute_force"
+
+    def __len__(self) -> int:
+        return len(self._index) if self._index is not None else 0
+
+    def _scan(self, edited_since: Optional[str] = None) -> Iterable[List[dict]]:
+        after_id = 0
+        while True:
+            rows = ClinicalHistoryService.scan_clinical_histories(
+                ",".join(SCAN_COLUMNS), after_id, SCAN_PAGE_SIZE, edited_since
+            )
+            if not rows:
+                return
+            yield rows
+            if len(rows) < SCAN_PAGE_SIZE:
+                return
+            after_id = rows[-1]["id"]
+
+    @staticmethod
+    def _latest(watermark: Optional[str], rows: List[dict]) -> Optional[str]:
+        for row in rows:
+            edited = row.get("edited")
+            if edited and (watermark is None or str(edited) > watermark):
+                watermark = str(edited)
+        return watermark
+
+    def rebuild(self) -> None:
+        with span("similarity:rebuild"):
+            start = time.perf_counter()
+            with self._lock:
+                self._removed_during_build = set()
+            try:
+                id_chunks, vector_chunks = [], []
+                watermark = None
+                for rows in self._scan():
+                    vectors, mask = encode(rows)
+                    id_chunks.append(np.array([row["id"] for row in rows], dtype=np.int64))
+                    vector_chunks.append(_impute(vectors, mask))
+                    watermark = self._latest(watermark, rows)
+                ids = np.concatenate(id_chunks) if id_chunks else np.empty(0, dtype=np.int64)
+                vectors = np.concatenate(vector_chunks) if vector_chunks else np.empty((0, DIMENSIONS), dtype=np.float32)
+
+                use_partitions = SIMILARITY_INDEX == "partitioned" or (
+                    SIMILARITY_INDEX == "auto" and len(ids) >= SIMILARITY_PARTITION_THRESHOLD
+                )
+                if use_partitions and len(ids):
+                    partitions = SIMILARITY_PARTITIONS or int(np.sqrt(len(ids)))
+                    index = PartitionedIndex(vectors, ids, partitions, SIMILARITY_PROBES)
+                else:
+                    index = BruteForceIndex(max(len(ids), 1024))
+                    index.upsert(ids, vectors)
+            finally:
+                with self._lock:
+                    removed, self._removed_during_build = self._removed_during_build, None
+
+            with self._lock:
+                for history_id in removed:
+                    index.remove(history_id)
+                self._index, self._watermark = index, watermark
+                self._built_at = time.monotonic()
+            logger.info(
+                f"Similarity index built: {len(ids)} histories, {self.kind}, "
+                f"{(time.perf_counter() - start) * 1000:.0f} ms"
+            )
+
+    @staticmethod
+    def _sync_since(watermark: Optional[str]) -> Optional[str]:
+        """Marca desde la que releer: `SIMILARITY_SYNC_OVERLAP_SECONDS` antes de la última vista.
+
+        `edited` lo pone `now()`, que es el inicio de la transacción y no el
+        commit: una escritura de otro worker que empezó antes de la última
+        sincronización y se confirmó después queda por debajo de la marca. Releer
+        un margen es inocuo porque `upsert` es idempotente.
+        """
+        if watermark is None:
+            return None
+        try:
+            since = datetime.fromisoformat(watermark) - timedelta(seconds=SIMILARITY_SYNC_OVERLAP_SECONDS)
+        except ValueError:
+            return watermark
+        return since.isoformat(timespec="microseconds")
+
+    def _sync(self) -> None:
+        # Solo filas editadas desde la última vez (en las altas created == edited).
+        # Las altas hechas durante una reconstrucción también se recogen aquí.
+        with span("similarity:sync"):
+            for rows in self._scan(edited_since=self._sync_since(self._watermark)):
+                self.upsert_rows(rows)
+
+    def refresh(self) -> None:
+        """Construye el índice si no existe o toca reconstruirlo; si no, sincroniza las filas editadas."""
+        if self._index is None or time.monotonic() - self._built_at >= SIMILARITY_REBUILD_SECONDS:
+            self.rebuild()
+        else:
+            self._sync()
+
+    def _maintain(self) -> None:
+        delay = 0.0
+        while not self._stop.wait(delay):
+            try:
+                self.refresh()
+                delay = max(SIMILARITY_SYNC_SECONDS, 1.0)
+            except Exception as e:
+                # Sin índice se reintenta pronto; con índice se sigue sirviendo el anterior
+                delay = BUILD_RETRY_SECONDS if self._index is None else max(SIMILARITY_SYNC_SECONDS, 1.0)
+                logger.warning(f"Similarity index refresh failed, retrying in {delay:.0f}s: {e}")
+
+    def start(self) -> None:
+        """Arranca el hilo que construye y mantiene el índice (no hace nada si ya está en marcha)."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._maintain, name="similarity-index", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def upsert_rows(self, rows: List[dict]) -> None:
+        """Alta o cambio de historias (filas completas tal como las devuelve la base de datos)."""
+        if not rows:
+            return
+        vectors, mask = encode(rows)
+        ids = np.array([row["id"] for row in rows], dtype=np.int64)
+        vectors = _impute(vectors, mask)
+        with self._lock:
+            if self._index is None:
+                # Aún no construido: la construcción en curso ya leerá esta fila
+                return
+            self._index.upsert(ids, vectors)
+            self._watermark = self._latest(self._watermark, rows)
+
+    def remove(self, history_id: int) -> None:
+        with self._lock:
+            if self._removed_during_build is not None:
+                self._removed_during_build.add(history_id)
+            if self._index is not None:
+                self._index.remove(history_id)
+
+    def search(self, features: dict, k: int, exclude_id: Optional[int] = None) -> List[dict]:
+        """Top-k historias más parecidas, comparando solo los rasgos presentes en `features`.
+
+        El índice solo guarda ids y vectores; los resultados de las k historias
+        se leen de la base de datos en una consulta por clave primaria.
+        """
+        if self._index is None:
+            self.start()
+            raise IndexWarmingUpError("Similarity index is warming up")
+        vectors, mask = encode([features])
+        weights = mask[0].astype(np.float32)
+        with span("similarity:search"), self._lock:
+            ids, distances = self._index.search(vectors[0], weights, k + (exclude_id is not None))
+        matches = [
+            (history_id, distance)
+            for history_id, distance in zip(ids.tolist(), distances.tolist())
+            if history_id != exclude_id
+        ][:k]
+        if not matches:
+            return []
+        rows = ClinicalHistoryService.get_clinical_histories_by_ids(
+            [history_id for history_id, _ in matches], ",".join(OUTCOME_COLUMNS)
+        )
+        outcomes = {row["id"]: row for row in rows}
+        # Una historia borrada por otro proceso sigue en el índice hasta la próxima reconstrucción
+        return [
+            {**outcomes[history_id], "distance": round(float(np.sqrt(distance)), 6)}
+            for history_id, distance in matches
+            if history_id in outcomes
+        ]
+
+
+similarity_index = SimilarityIndex()
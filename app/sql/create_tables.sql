@@ -87,6 +87,180 @@ FOR EACH ROW
 EXECUTE FUNCTION update_clinical_histories_edited_column();
 
 
+-- =========================================
+-- Tabla: patient_summary
+-- Resumen por paciente para worklists (GET /patients/summary), mantenido por
+-- triggers: cada cambio en clinical_histories recalcula solo la fila de ese
+-- paciente, usando el índice (document_id, id).
+-- =========================================
+CREATE TABLE IF NOT EXISTS patient_summary (
+    document_id VARCHAR(50) PRIMARY KEY REFERENCES patient(document_id) ON DELETE CASCADE,
+    name VARCHAR(255) NOT NULL,
+    history_count INT NOT NULL DEFAULT 0,
+    -- Datos de la historia clínica más reciente (mayor id)
+    latest_history_id INT,
+    latest_stage_at_diagnosis VARCHAR(10),
+    latest_tumor_aggressiveness VARCHAR(10),
+    latest_recurrence VARCHAR(10),
+    latest_history_edited TIMESTAMP WITH TIME ZONE,
+    -- Alguna historia del paciente registra recurrencia
+    has_recurrence BOOLEAN NOT NULL DEFAULT FALSE,
+    edited TIMESTAMP WITH TIME ZONE DEFAULT timezone('America/Bogota', now()) NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_clinical_histories_document_id_id
+ON clinical_histories(document_id, id DESC);
+
+CREATE OR REPLACE FUNCTION refresh_patient_summary(p_document_id VARCHAR)
+RETURNS VOID AS $$
+BEGIN
+  -- Bloquear primero la fila: con dos escrituras concurrentes del mismo paciente,
+  -- el UPDATE siguiente toma un snapshot nuevo y ve la otra ya confirmada
+  PERFORM 1 FROM patient_summary WHERE document_id = p_document_id FOR UPDATE;
+
+  UPDATE patient_summary s
+  SET history_count = agg.history_count,
+      has_recurrence = agg.has_recurrence,
+      latest_history_id = latest.id,
+      latest_stage_at_diagnosis = latest.stage_at_diagnosis,
+      latest_tumor_aggressiveness = latest.tumor_aggressiveness,
+      latest_recurrence = latest.recurrence,
+      latest_history_edited = latest.edited,
+      edited = timezone('America/Bogota', now())
+  FROM (
+    SELECT count(*)::INT AS history_count,
+           coalesce(bool_or(recurrence = 'Yes'), FALSE) AS has_recurrence
+    FROM clinical_histories
+    WHERE document_id = p_document_id
+  ) agg
+  LEFT JOIN LATERAL (
+    SELECT id, stage_at_diagnosis, tumor_aggressiveness, recurrence, edited
+    FROM clinical_histories
+    WHERE document_id = p_document_id
+    ORDER BY id DESC
+    LIMIT 1
+  ) latest ON TRUE
+  WHERE s.document_id = p_document_id;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION clinical_histories_refresh_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+  -- rescore_clinical_histories actualiza los resúmenes afectados en una sola sentencia
+  IF current_setting('oncoassist.skip_summary_refresh', TRUE) = 'on' THEN
+    RETURN NULL;
+  END IF;
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    PERFORM refresh_patient_summary(OLD.document_id);
+  END IF;
+  IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND NEW.document_id IS DISTINCT FROM OLD.document_id) THEN
+    PERFORM refresh_patient_summary(NEW.document_id);
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS refresh_patient_summary_on_history ON clinical_histories;
+
+-- Cualquier UPDATE cuenta: el trigger BEFORE UPDATE cambia `edited`, que el resumen copia
+CREATE TRIGGER refresh_patient_summary_on_history
+AFTER INSERT OR UPDATE OR DELETE ON clinical_histories
+FOR EACH ROW
+EXECUTE FUNCTION clinical_histories_refresh_summary();
+
+CREATE OR REPLACE FUNCTION patient_sync_summary()
+RETURNS TRIGGER AS $$
+BEGIN
+  IF TG_OP = 'INSERT' THEN
+    INSERT INTO patient_summary (document_id, name)
+    VALUES (NEW.document_id, NEW.name)
+    ON CONFLICT (document_id) DO NOTHING;
+  ELSIF NEW.name IS DISTINCT FROM OLD.name THEN
+    UPDATE patient_summary
+    SET name = NEW.name, edited = timezone('America/Bogota', now())
+    WHERE document_id = NEW.document_id;
+  END IF;
+  RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS sync_patient_summary ON patient;
+
+CREATE TRIGGER sync_patient_summary
+AFTER INSERT OR UPDATE OF name ON patient
+FOR EACH ROW
+EXECUTE FUNCTION patient_sync_summary();
+
+-- Carga inicial (idempotente) para bases de datos con datos previos
+INSERT INTO patient_summary (
+    document_id, name, history_count, latest_history_id, latest_stage_at_diagnosis,
+    latest_tumor_aggressiveness, latest_recurrence, latest_history_edited, has_recurrence
+)
+SELECT p.document_id, p.name,
+       coalesce(agg.history_count, 0), latest.id, latest.stage_at_diagnosis,
+       latest.tumor_aggressiveness, latest.recurrence, latest.edited,
+       coalesce(agg.has_recurrence, FALSE)
+FROM patient p
+LEFT JOIN (
+    SELECT document_id, count(*)::INT AS history_count, bool_or(recurrence = 'Yes') AS has_recurrence
+    FROM clinical_histories
+    GROUP BY document_id
+) agg ON agg.document_id = p.document_id
+LEFT JOIN (
+    SELECT DISTINCT ON (document_id) document_id, id, stage_at_diagnosis, tumor_aggressiveness, recurrence, edited
+    FROM clinical_histories
+    ORDER BY document_id, id DESC
+) latest ON latest.document_id = p.document_id
+ON CONFLICT (document_id) DO UPDATE
+SET name = EXCLUDED.name,
+    history_count = EXCLUDED.history_count,
+    latest_history_id = EXCLUDED.latest_history_id,
+    latest_stage_at_diagnosis = EXCLUDED.latest_stage_at_diagnosis,
+    latest_tumor_aggressiveness = EXCLUDED.latest_tumor_aggressiveness,
+    latest_recurrence = EXCLUDED.latest_recurrence,
+    latest_history_edited = EXCLUDED.latest_history_edited,
+    has_recurrence = EXCLUDED.has_recurrence;
+
+
+-- =========================================
+-- Función: rescore_clinical_histories
+-- Escritura en lote del job de recálculo de recomendaciones
+-- (python -m app.jobs.rescore): un único UPDATE por lote en lugar de un PATCH
+-- por historia. Recibe [{"id", "treatment_id", "treatment_recommendation"}, ...]
+-- y devuelve el número de filas actualizadas. En lugar de recalcular el resumen
+-- de cada paciente fila a fila, desactiva ese trigger durante el UPDATE y
+-- después copia `edited` a los resúmenes cuya historia más reciente cambió
+-- (lo único del resumen que depende de las columnas reescritas).
+-- =========================================
+CREATE OR REPLACE FUNCTION rescore_clinical_histories(updates JSONB)
+RETURNS INT AS $$
+DECLARE
+  updated_count INT;
+BEGIN
+  -- Local a la transacción: no afecta a otras sentencias de la misma conexión
+  PERFORM set_config('oncoassist.skip_summary_refresh', 'on', TRUE);
+  UPDATE clinical_histories h
+  SET treatment_id = u.treatment_id,
+      treatment_recommendation = u.treatment_recommendation
+  FROM jsonb_to_recordset(updates) AS u(id INT, treatment_id INT, treatment_recommendation VARCHAR(10))
+  WHERE h.id = u.id;
+  GET DIAGNOSTICS updated_count = ROW_COUNT;
+  PERFORM set_config('oncoassist.skip_summary_refresh', 'off', TRUE);
+
+  -- Por la PK del resumen (document_id): una búsqueda por historia reescrita
+  UPDATE patient_summary s
+  SET latest_history_edited = h.edited,
+      edited = timezone('America/Bogota', now())
+  FROM jsonb_to_recordset(updates) AS u(id INT)
+  JOIN clinical_histories h ON h.id = u.id
+  WHERE s.document_id = h.document_id
+    AND s.latest_history_id = h.id;
+  RETURN updated_count;
+END;
+$$ LANGUAGE plpgsql;
+
+
 -- =========================================
 -- Índices para optimizar consultas
 -- =========================================
@@ -0,0 +1,368 @@
+"""Generador vectorizado de pacientes e historias clínicas sintéticas.
+
+Genera datos que cumplen el esquema (`PatientCreate`, `ClinicalHistoryCreate`
+y `app/sql/create_tables.sql`) por bloques de pacientes con NumPy y los
+escribe en streaming, sin mantener el dataset completo en memoria:
+
+    python -m benchmarks.datagen --histories 10000000 --format copy --out data/
+    psql "$DATABASE_URL" -f data/patient.sql -f data/clinical_histories.sql
+
+Formatos: `csv` (con cabecera), `ndjson` y `copy` (script `COPY ... FROM
+stdin` de Postgres). El resultado es reproducible para una misma semilla y
+tamaño de bloque.
+"""
+import argparse
+import math
+import os
+import sys
+import time
+from typing import Dict, Iterator, List, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from app.schemas.patient import Gender, UrbanOrRural
+from app.schemas.clinical_history import (
+    StageAtDiagnosis,
+    TumorAggressiveness,
+    FollowUpAdherence,
+    TreatmentAccess,
+    ScreeningRegularity,
+    DietType,
+    PhysicalActivityLevel,
+    SmokingStatus,
+    AlcoholConsumption,
+    FiberConsumption,
+    InsuranceCoverage,
+    TimeToDiagnosis,
+    FamilyHistory,
+    PreviousCancerHistory,
+    ColonoscopyAccess,
+    ChemotherapyReceived,
+    RadiotherapyReceived,
+    SurgeryReceived,
+    Recurrence,
+)
+
+DOCUMENT_BASE = 20000000
+
+# Regiones con nombres de como mucho 20 caracteres (patient.region VARCHAR(20))
+REGIONS = [
+    "Antioquia", "Atlántico", "Bogotá", "Bolívar", "Boyacá", "Caldas", "Cauca",
+    "Cesar", "Córdoba", "Cundinamarca", "Huila", "Magdalena", "Meta", "Nariño",
+    "Norte de Santander", "Quindío", "Risaralda", "Santander", "Sucre", "Tolima",
+    "Valle del Cauca",
+]
+RACES = ["Mestizo", "White", "Afro-Colombian", "Indigenous", "Other"]
+TREATMENT_RECOMMENDATIONS = ["T1", "T2", "T3", "T4", "T5"]
+
+# Columnas en el orden de app/sql/create_tables.sql (sin valores por defecto de la BD)
+PATIENT_COLUMNS = [
+    "document_id", "name", "age", "gender", "race", "region", "urban_or_rural",
+    "email", "phone", "address", "created", "edited",
+]
+HISTORY_COLUMNS = [
+    "id", "document_id", "family_history", "previous_cancer_history",
+    "stage_at_diagnosis", "tumor_aggressiveness", "colonoscopy_access",
+    "screening_regularity", "diet_type", "bmi", "physical_activity_level",
+    "smoking_status", "alcohol_consumption", "fiber_consumption",
+    "insurance_coverage", "time_to_diagnosis", "treatment_access", "treatment_id",
+    "chemotherapy_received", "radiotherapy_received", "surgery_received",
+    "treatment_recommendation", "follow_up_adherence", "recurrence",
+    "time_to_recurrence", "created", "edited",
+]
+NUMERIC_COLUMNS = {"age", "id", "bmi", "treatment_id", "time_to_recurrence"}
+
+# Probabilidades de cada valor (en el orden de la Enum) y de que el campo opcional sea nulo
+ENUM_FIELDS: Dict[str, Tuple[type, List[float], float]] = {
+    "family_history": (FamilyHistory, [0.3, 0.7], 0.05),
+    "previous_cancer_history": (PreviousCancerHistory, [0.1, 0.9], 0.05),
+    "stage_at_diagnosis": (StageAtDiagnosis, [0.2, 0.3, 0.3, 0.2], 0.0),
+    "tumor_aggressiveness": (TumorAggressiveness, [0.3, 0.45, 0.25], 0.0),
+    "colonoscopy_access": (ColonoscopyAccess, [0.6, 0.4], 0.05),
+    "screening_regularity": (ScreeningRegularity, [0.35, 0.4, 0.25], 0.05),
+    "diet_type": (DietType, [0.05, 0.02, 0.5, 0.08, 0.35], 0.05),
+    "physical_activity_level": (PhysicalActivityLevel, [0.45, 0.35, 0.2], 0.05),
+    "smoking_status": (SmokingStatus, [0.55, 0.2, 0.25], 0.05),
+    "alcohol_consumption": (AlcoholConsumption, [0.5, 0.35, 0.15], 0.05),
+    "fiber_consumption": (FiberConsumption, [0.4, 0.4, 0.2], 0.05),
+    "insurance_coverage": (InsuranceCoverage, [0.8, 0.2], 0.05),
+    "time_to_diagnosis": (TimeToDiagnosis, [0.4, 0.6], 0.05),
+    "treatment_access": (TreatmentAccess, [0.65, 0.35], 0.0),
+    "chemotherapy_received": (ChemotherapyReceived, [0.6, 0.4], 0.05),
+    "radiotherapy_received": (RadiotherapyReceived, [0.35, 0.65], 0.05),
+    "surgery_received": (SurgeryReceived, [0.7, 0.3], 0.05),
+    "follow_up_adherence": (FollowUpAdherence, [0.7, 0.3], 0.0),
+}
+
+# Probabilidad de recurrencia según estadio (I..IV) y ajuste por agresividad (Low..High)
+RECURRENCE_BY_STAGE = [0.08, 0.18, 0.35, 0.6]
+RECURRENCE_BY_AGGRESSIVENESS = [-0.05, 0.0, 0.12]
+
+# Rango de fechas de creación: últimos ~5 años hasta 2025-01-01
+CREATED_END = 1735689600
+CREATED_SPAN = 5 * 365 * 86400
+
+
+class Column:
+    """Valores de una columna como arrays de NumPy, con máscara opcional de nulos."""
+
+    __slots__ = ("values", "nulls")
+
+    def __init__(self, values, nulls=None):
+        self.values = values
+        self.nulls = nulls
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("numpy is required for the data generator: pip install numpy")
+
+
+def _choice(rng, values: List[str], p: List[float], size: int, null_rate: float = 0.0) -> Column:
+    indexes = rng.choice(len(values), size=size, p=p)
+    column = np.array(values, dtype=object)[indexes]
+    nulls = rng.random(size) < null_rate if null_rate else None
+    return Column(column, nulls)
+
+
+def _index_of(values, options: List[str]):
+    """Posición de cada valor dentro de `options` (vectorizado)."""
+    return (values[:, None] == np.array(options, dtype=object)).argmax(axis=1)
+
+
+def _timestamps(rng, size: int) -> Column:
+    seconds = CREATED_END - rng.integers(0, CREATED_SPAN, size=size)
+    stamps = seconds.astype("datetime64[s]").astype(str)
+    return Column(np.char.add(stamps, "+00:00").astype(object))
+
+
+def generate_chunk(
+    seed: int,
+    chunk_index: int,
+    first_patient: int,
+    patients: int,
+    first_history_id: int,
+    mean_histories: float,
+    max_histories: int,
+) -> Tuple[Dict[str, Column], Dict[str, Column]]:
+    """Genera un bloque de `patients` pacientes con 0..`max_histories` historias cada uno."""
+    _require_numpy()
+    rng = np.random.default_rng([seed, chunk_index])
+    n = patients
+    index = np.arange(first_patient, first_patient + n)
+    index_str = index.astype(str)
+
+    document_ids = (index + DOCUMENT_BASE).astype(str).astype(object)
+    patient = {
+        "document_id": Column(document_ids),
+        "name": Column(np.char.add("Patient ", index_str).astype(object)),
+        "age": Column(np.clip(rng.normal(62, 13, n), 18, 100).astype(np.int64)),
+        "gender": _choice(rng, [g.value for g in Gender], [0.49, 0.49, 0.02], n),
+        "race": _choice(rng, RACES, [0.5, 0.25, 0.12, 0.05, 0.08], n, 0.1),
+        "region": _choice(rng, REGIONS, [1 / len(REGIONS)] * len(REGIONS), n, 0.05),
+        "urban_or_rural": _choice(rng, [u.value for u in UrbanOrRural], [0.75, 0.25], n, 0.05),
+        "email": Column(np.char.add(np.char.add("patient", index_str), "@example.com").astype(object)),
+        "phone": Column(
+            np.char.add("+57 3", np.char.zfill(rng.integers(0, 10**9, n).astype(str), 9)).astype(object),
+            rng.random(n) < 0.2,
+        ),
+        "address": Column(
+            np.char.add(
+                np.char.add("Calle ", rng.integers(1, 200, n).astype(str)),
+                np.char.add(" #", rng.integers(1, 100, n).astype(str)),
+            ).astype(object),
+            rng.random(n) < 0.3,
+        ),
+    }
+    patient["created"] = _timestamps(rng, n)
+    patient["edited"] = patient["created"]
+
+    counts = np.minimum(rng.poisson(mean_histories, n), max_histories)
+    m = int(counts.sum())
+    history = {
+        "id": Column(np.arange(first_history_id, first_history_id + m)),
+        "document_id": Column(np.repeat(document_ids, counts)),
+    }
+    for field, (enum, p, null_rate) in ENUM_FIELDS.items():
+        history[field] = _choice(rng, [e.value for e in enum], p, m, null_rate)
+
+    bmi = np.clip(rng.lognormal(np.log(26.5), 0.18, m), 15, 60).round(2)
+    history["bmi"] = Column(bmi, rng.random(m) < 0.05)
+    history["treatment_id"] = Column(rng.integers(1, 21, m), rng.random(m) < 0.3)
+    history["treatment_recommendation"] = _choice(rng, TREATMENT_RECOMMENDATIONS, [0.2] * 5, m, 0.3)
+
+    # La recurrencia depende del estadio y la agresividad; el tiempo solo existe si hubo recurrencia
+    stage = _index_of(history["stage_at_diagnosis"].values, [s.value for s in StageAtDiagnosis])
+    aggressiveness = _index_of(history["tumor_aggressiveness"].values, [a.value for a in TumorAggressiveness])
+    p_recurrence = np.array(RECURRENCE_BY_STAGE)[stage] + np.array(RECURRENCE_BY_AGGRESSIVENESS)[aggressiveness]
+    recurred = rng.random(m) < p_recurrence
+    history["recurrence"] = Column(
+        np.where(recurred, Recurrence.YES.value, Recurrence.NO.value).astype(object),
+        rng.random(m) < 0.05,
+    )
+    days = np.clip(rng.gamma(2.0, 350.0, m), 30, 3650).astype(np.int64)
+    history["time_to_recurrence"] = Column(days, ~recurred | history["recurrence"].nulls)
+
+    history["created"] = _timestamps(rng, m)
+    history["edited"] = history["created"]
+    return patient, history
+
+
+def _encode(name: str, column: Column, fmt: str) -> List[str]:
+    """Convierte una columna en la lista de fragmentos de texto de cada fila."""
+    values = column.values
+    if values.dtype == object:
+        # Ya son str: evitamos astype(str), que copia a un array unicode de ancho fijo
+        text = values
+    elif values.dtype.kind == "f":
+        text = np.char.mod("%.2f", values).astype(object)
+    else:
+        text = values.astype(str).astype(object)
+    if fmt == "ndjson":
+        if name in NUMERIC_COLUMNS:
+            text = f'"{name}":' + text
+        else:
+            text = f'"{name}":"' + text + '"'
+        null = f'"{name}":null'
+    else:
+        null = "" if fmt == "csv" else r"\N"
+    if column.nulls is not None:
+        text = text.copy() if text is values else text
+        text[column.nulls] = null
+    return text.tolist()
+
+
+def format_rows(columns: Dict[str, Column], names: List[str], fmt: str) -> str:
+    encoded = [_encode(name, columns[name], fmt) for name in names]
+    if fmt == "ndjson":
+        return "".join("{" + ",".join(row) + "}\n" for row in zip(*encoded))
+    separator = "," if fmt == "csv" else "\t"
+    return "".join(separator.join(row) + "\n" for row in zip(*encoded))
+
+
+def chunk_records(columns: Dict[str, Column], names: List[str]) -> Iterator[dict]:
+    """Filas de un bloque como diccionarios (para sembrar stores en memoria)."""
+    lists = []
+    for name in names:
+        column = columns[name]
+        values = column.values.tolist()
+        if column.nulls is not None:
+            values = [None if null else value for value, null in zip(values, column.nulls.tolist())]
+        lists.append(values)
+    for row in zip(*lists):
+        yield dict(zip(names, row))
+
+
+def iter_chunks(
+    patients: int,
+    mean_histories: float = 2.0,
+    max_histories: int = 10,
+    seed: int = 0,
+    chunk_size: int = 100000,
+) -> Iterator[Tuple[Dict[str, Column], Dict[str, Column]]]:
+    next_history_id = 1
+    for chunk_index, first in enumerate(range(0, patients, chunk_size)):
+        size = min(chunk_size, patients - first)
+        patient, history = generate_chunk(
+            seed, chunk_index, first, size, next_history_id, mean_histories, max_histories
+        )
+        next_history_id += len(history["id"].values)
+        yield patient, history
+
+
+def _header(table: str, names: List[str], fmt: str) -> str:
+    if fmt == "csv":
+        return ",".join(names) + "\n"
+    if fmt == "copy":
+        return f"COPY {table} ({', '.join(names)}) FROM stdin;\n"
+    return ""
+
+
+def _footer(table: str, fmt: str) -> str:
+    if fmt != "copy":
+        return ""
+    footer = "\\.\n"
+    if table == "clinical_histories":
+        # Los ids se generan aquí: avanzar la secuencia del SERIAL
+        footer += (
+            "SELECT setval(pg_get_serial_sequence('clinical_histories', 'id'), "
+            "(SELECT COALESCE(MAX(id), 1) FROM clinical_histories));\n"
+        )
+    return footer
+
+
+def write_dataset(
+    out_dir: str,
+    fmt: str,
+    patients: int,
+    mean_histories: float = 2.0,
+    max_histories: int = 10,
+    seed: int = 0,
+    chunk_size: int = 100000,
+    progress=None,
+) -> Tuple[int, int]:
+    """Escribe `patient.<ext>` y `clinical_histories.<ext>` en `out_dir`. Devuelve los conteos."""
+    extension = {"csv": "csv", "ndjson": "ndjson", "copy": "sql"}[fmt]
+    os.makedirs(out_dir, exist_ok=True)
+    outputs = {
+        "patient": (open(os.path.join(out_dir, f"patient.{extension}"), "w", encoding="utf-8"), PATIENT_COLUMNS),
+        "clinical_histories": (
+            open(os.path.join(out_dir, f"clinical_histories.{extension}"), "w", encoding="utf-8"),
+            HISTORY_COLUMNS,
+        ),
+    }
+    totals = {"patient": 0, "clinical_histories": 0}
+    try:
+        for table, (f, names) in outputs.items():
+            f.write(_header(table, names, fmt))
+        for patient, history in iter_chunks(patients, mean_histories, max_histories, seed, chunk_size):
+            for table, columns in (("patient", patient), ("clinical_histories", history)):
+                f, names = outputs[table]
+                f.write(format_rows(columns, names, fmt))
+                totals[table] += len(columns["document_id"].values)
+            if progress:
+                progress(totals["patient"], totals["clinical_histories"])
+        for table, (f, _) in outputs.items():
+            f.write(_footer(table, fmt))
+    finally:
+        for f, _ in outputs.values():
+            f.close()
+    return totals["patient"], totals["clinical_histories"]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    size = parser.add_mutually_exclusive_group(required=True)
+    size.add_argument("--patients", type=int, help="Number of patients to generate.")
+    size.add_argument("--histories", type=int, help="Approximate number of clinical histories to generate.")
+    parser.add_argument("--mean-histories", type=float, default=2.0, help="Mean histories per patient (Poisson).")
+    parser.add_argument("--max-histories", type=int, default=10, help="Maximum histories per patient.")
+    parser.add_argument("--format", choices=["csv", "ndjson", "copy"], default="csv")
+    parser.add_argument("--out", required=True, help="Output directory.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=100000, help="Patients generated per chunk.")
+    args = parser.parse_args(argv)
+
+    patients = args.patients or math.ceil(args.histories / args.mean_histories)
+    start = time.perf_counter()
+
+    def progress(done_patients: int, done_histories: int) -> None:
+        elapsed = time.perf_counter() - start
+        print(
+            f"\r{done_patients}/{patients} patients, {done_histories} histories "
+            f"({done_histories / elapsed:,.0f} histories/s)",
+            end="", file=sys.stderr, flush=True,
+        )
+
+    totals = write_dataset(
+        args.out, args.format, patients, args.mean_histories, args.max_histories,
+        args.seed, args.chunk_size, progress,
+    )
+    print(f"\nWrote {totals[0]} patients and {totals[1]} histories in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
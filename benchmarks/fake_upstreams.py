@@ -0,0 +1,283 @@
+"""Stand-ins locales de Supabase (PostgREST) y del servicio de auth para benchmarks.
+
+Implementa solo lo que usan los servicios de la API: filtros `eq`/`gt`/`gte`/
+`lt`/`lte` (e `in` sobre la clave primaria), `select`, `order`, `limit`/`offset`, `single()` y
+`return=representation`, `count=exact` y la función
+`rescore_clinical_histories`. Los datos viven en memoria; `patient_summary`
+se mantiene en cada escritura como hacen los triggers de `create_tables.sql`.
+
+    python -m benchmarks.fake_upstreams --port 54321 --auth-latency-ms 5
+"""
+import argparse
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.datagen import HISTORY_COLUMNS, PATIENT_COLUMNS, chunk_records, iter_chunks
+
+OPERATORS = {
+    "eq": lambda a, b: a == b,
+    "gt": lambda a, b: a > b,
+    "gte": lambda a, b: a >= b,
+    "lt": lambda a, b: a < b,
+    "lte": lambda a, b: a <= b,
+}
+RESERVED_PARAMS = {"select", "order", "limit", "offset", "columns", "on_conflict"}
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _coerce(value: str, sample):
+    """Convierte el valor del filtro al tipo de la columna."""
+    if isinstance(sample, bool):
+        return value == "true"
+    if isinstance(sample, int):
+        return int(value)
+    if isinstance(sample, float):
+        return float(value)
+    return value
+
+
+class FakeDatabase:
+    PRIMARY_KEYS = {"patient": "document_id", "clinical_histories": "id", "patient_summary": "document_id"}
+
+    def __init__(self):
+        self.tables: Dict[str, List[dict]] = {table: [] for table in self.PRIMARY_KEYS}
+        # Índice por clave primaria para las búsquedas `eq` sobre la PK
+        self._index: Dict[str, Dict[object, dict]] = {table: {} for table in self.PRIMARY_KEYS}
+        self._histories: Dict[str, List[dict]] = {}
+        self._next_id = 1
+
+    def seed(self, patients: int, mean_histories: float, seed: int = 0) -> None:
+        for patient, history in iter_chunks(patients, mean_histories, seed=seed):
+            for row in chunk_records(patient, PATIENT_COLUMNS):
+                self.insert("patient", row)
+            for row in chunk_records(history, HISTORY_COLUMNS):
+                self.insert("clinical_histories", row)
+                self._next_id = row["id"] + 1
+
+    def insert(self, table: str, row: dict) -> dict:
+        row = dict(row)
+        if table == "clinical_histories" and "id" not in row:
+            row["id"] = self._next_id
+            self._next_id += 1
+        row.setdefault("created", _now())
+        row.setdefault("edited", row["created"])
+        self._store(table, row)
+        if table == "patient":
+            self._store("patient_summary", {"document_id": row["document_id"], "name": row["name"], "edited": row["edited"]})
+            self.refresh_summary(row["document_id"])
+        elif table == "clinical_histories":
+            self._histories.setdefault(row["document_id"], []).append(row)
+            self.refresh_summary(row["document_id"])
+        return row
+
+    def _store(self, table: str, row: dict) -> None:
+        self.tables[table].append(row)
+        self._index[table][row[self.PRIMARY_KEYS[table]]] = row
+
+    def delete(self, table: str, rows: List[dict]) -> None:
+        doomed = {id(row) for row in rows}
+        self.tables[table] = [row for row in self.tables[table] if id(row) not in doomed]
+        for row in rows:
+            self._index[table].pop(row[self.PRIMARY_KEYS[table]], None)
+            if table == "patient":
+                summary = self.get("patient_summary", row["document_id"])
+                if summary is not None:
+                    self.delete("patient_summary", [summary])
+            elif table == "clinical_histories":
+                histories = self._histories.get(row["document_id"], [])
+                self._histories[row["document_id"]] = [h for h in histories if h is not row]
+                self.refresh_summary(row["document_id"])
+
+    def updated(self, table: str, row: dict, previous_document_id: Optional[str] = None) -> None:
+        """Mantiene el resumen tras un PATCH (el equivalente a los triggers AFTER UPDATE)."""
+        if table == "patient":
+            summary = self.get("patient_summary", row["document_id"])
+            if summary is not None:
+                summary["name"] = row["name"]
+        elif table == "clinical_histories":
+            if previous_document_id is not None and previous_document_id != row["document_id"]:
+                self._histories[previous_document_id].remove(row)
+                self._histories.setdefault(row["document_id"], []).append(row)
+                self.refresh_summary(previous_document_id)
+            self.refresh_summary(row["document_id"])
+
+    def refresh_summary(self, document_id: str) -> None:
+        summary = self.get("patient_summary", document_id)
+        if summary is None:
+            return
+        histories = self._histories.get(document_id, [])
+        latest = max(histories, key=lambda h: h["id"], default={})
+        summary.update({
+            "history_count": len(histories),
+            "latest_history_id": latest.get("id"),
+            "latest_stage_at_diagnosis": latest.get("stage_at_diagnosis"),
+            "latest_tumor_aggressiveness": latest.get("tumor_aggressiveness"),
+            "latest_recurrence": latest.get("recurrence"),
+            "latest_history_edited": latest.get("edited"),
+            "has_recurrence": any(h.get("recurrence") == "Yes" for h in histories),
+            "edited": _now(),
+        })
+
+    def get(self, table: str, key_value) -> Optional[dict]:
+        return self._index[table].get(key_value)
+
+    def query(self, table: str, params, paginate: bool = True) -> List[dict]:
+        rows = self.tables[table]
+        key = self.PRIMARY_KEYS[table]
+        pk_filter = params.get(key, "")
+        if pk_filter.startswith("eq."):
+            row = self._index[table].get(_coerce(pk_filter[3:], 0 if key == "id" else ""))
+            rows = [row] if row is not None else []
+        elif pk_filter.startswith("in.("):
+            keys = [_coerce(value, 0 if key == "id" else "") for value in pk_filter[4:-1].split(",") if value]
+            rows = [self._index[table][k] for k in keys if k in self._index[table]]
+        for column, expression in params.multi_items():
+            if column in RESERVED_PARAMS or "." not in expression:
+                continue
+            op, _, raw = expression.partition(".")
+            compare = OPERATORS.get(op)
+            if compare is None:
+                continue
+            rows = [
+                row for row in rows
+                if row.get(column) is not None and compare(row[column], _coerce(raw, row[column]))
+            ]
+
+        order = params.get("order")
+        if order:
+            for clause in reversed(order.split(",")):
+                column, _, direction = clause.partition(".")
+                rows = sorted(
+                    rows,
+                    key=lambda r: (r.get(column) is None, r.get(column)),
+                    reverse=direction.startswith("desc"),
+                )
+
+        if not paginate:
+            return rows
+        offset = int(params.get("offset", 0))
+        limit = params.get("limit")
+        rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+        return rows
+
+
+def _project(rows: List[dict], select: str) -> List[dict]:
+    if not select or select == "*":
+        return rows
+    columns = [c.strip() for c in select.split(",")]
+    return [{c: row.get(c) for c in columns} for row in rows]
+
+
+def create_app(auth_latency_ms: float = 0.0, db_latency_ms: float = 0.0, db: FakeDatabase = None) -> FastAPI:
+    app = FastAPI(title="Fake upstreams")
+    app.state.db = db or FakeDatabase()
+
+    @app.get("/me")
+    async def me(request: Request):
+        if auth_latency_ms:
+            await asyncio.sleep(auth_latency_ms / 1000)
+        if not request.headers.get("authorization", "").startswith("Bearer "):
+            return JSONResponse({"detail": "Unauthorized"}, status_code=401)
+        return {"id": "bench-user", "email": "bench@example.com"}
+
+    @app.post("/rest/v1/rpc/rescore_clinical_histories")
+    async def rescore(request: Request):
+        if db_latency_ms:
+            await asyncio.sleep(db_latency_ms / 1000)
+        store: FakeDatabase = request.app.state.db
+        updated = 0
+        for update in json.loads(await request.body())["updates"]:
+            row = store.get("clinical_histories", update["id"])
+            if row is not None:
+                row["treatment_id"] = update["treatment_id"]
+                row["treatment_recommendation"] = update["treatment_recommendation"]
+                row["edited"] = _now()
+                updated += 1
+                summary = store.get("patient_summary", row["document_id"])
+                if summary is not None and summary.get("latest_history_id") == row["id"]:
+                    summary["latest_history_edited"] = row["edited"]
+                    summary["edited"] = row["edited"]
+        return JSONResponse(updated)
+
+    @app.api_route("/rest/v1/{table}", methods=["GET", "POST", "PATCH", "DELETE"])
+    async def rest(table: str, request: Request):
+        if db_latency_ms:
+            await asyncio.sleep(db_latency_ms / 1000)
+        store: FakeDatabase = request.app.state.db
+        if table not in store.tables:
+            return JSONResponse({"code": "42P01", "message": f"relation {table} does not exist"}, status_code=404)
+
+        if request.method == "POST":
+            body = json.loads(await request.body())
+            body = body if isinstance(body, list) else [body]
+            key = store.PRIMARY_KEYS[table]
+            if any(row.get(key) is not None and store.get(table, row[key]) for row in body):
+                return JSONResponse({
+                    "code": "23505",
+                    "message": f'duplicate key value violates unique constraint "{table}_pkey"',
+                    "details": None,
+                    "hint": None,
+                }, status_code=409)
+            rows = [store.insert(table, row) for row in body]
+            return JSONResponse(rows, status_code=201)
+
+        rows = store.query(table, request.query_params)
+        if request.method == "PATCH":
+            changes = json.loads(await request.body())
+            for row in rows:
+                previous_document_id = row.get("document_id")
+                row.update(changes)
+                row["edited"] = _now()
+                store.updated(table, row, previous_document_id)
+        elif request.method == "DELETE":
+            store.delete(table, rows)
+
+        headers = {}
+        if "count=exact" in request.headers.get("prefer", ""):
+            total = len(store.query(table, request.query_params, paginate=False))
+            offset = int(request.query_params.get("offset", 0))
+            headers["Content-Range"] = f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"
+        rows = _project(rows, request.query_params.get("select"))
+        if request.headers.get("accept") == "application/vnd.pgrst.object+json":
+            if len(rows) != 1:
+                return JSONResponse({
+                    "code": "PGRST116",
+                    "message": "JSON object requested, multiple (or no) rows returned",
+                    "details": f"The result contains {len(rows)} rows",
+                    "hint": None,
+                }, status_code=406)
+            return JSONResponse(rows[0], headers=headers)
+        return JSONResponse(rows, headers=headers)
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=54321)
+    parser.add_argument("--auth-latency-ms", type=float, default=0.0)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--mean-histories", type=float, default=3.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    db = FakeDatabase()
+    db.seed(args.patients, args.mean_histories, args.seed)
+    app = create_app(args.auth_latency_ms, args.db_latency_ms, db)
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Mide el tiempo de import de la API con `python -X importtime`.
+
+Importa `app.main` en un proceso limpio, muestra los módulos más lentos
+(tiempo acumulado) y sale con código 1 si el total supera el presupuesto,
+para usarlo como check en CI:
+
+    python -m benchmarks.import_time --budget-ms 1000 --top 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+from typing import List, Tuple
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module: str) -> List[Tuple[str, int, int]]:
+    """Devuelve (módulo, self_us, cumulative_us) por cada import de nivel superior o anidado."""
+    env = {
+        **os.environ,
+        # Valores de relleno: importar la app no debe necesitar upstreams reales
+        "SUPABASE_URL": os.environ.get("SUPABASE_URL", "http://127.0.0.1:1"),
+        "SUPABASE_SERVICE_ROLE_KEY": os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "import-time"),
+    }
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=env, capture_output=True, text=True,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{completed.stderr}")
+
+    rows = []
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.rstrip(), int(self_us), int(cumulative_us)))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--budget-ms", type=float, default=1000.0, help="Fail if the total import time exceeds this.")
+    parser.add_argument("--top", type=int, default=15, help="Number of slowest modules to show.")
+    args = parser.parse_args(argv)
+
+    rows = measure(args.module)
+    # Los módulos de primer nivel (sin sangría) suman el total del import
+    total_ms = sum(cumulative for name, _, cumulative in rows if not name.startswith("  ")) / 1000
+
+    print(f"{'cumulative ms':>14} {'self ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(rows, key=lambda r: r[2], reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>14.1f} {self_us / 1000:>9.1f}  {name.strip()}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    if total_ms > args.budget_ms:
+        print("Import time budget exceeded", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
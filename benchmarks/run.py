@@ -0,0 +1,346 @@
+"""Benchmark de la API contra stand-ins locales de Supabase y del servicio de auth.
+
+Levanta `benchmarks.fake_upstreams` y la API (`app.main:app` con uvicorn) en
+procesos separados, recorre todas las rutas de pacientes e historias clínicas
+con varios niveles de concurrencia y escribe throughput y latencias
+p50/p95/p99 en JSON para comparar entre commits:
+
+    python -m benchmarks.run --concurrency 1,8,32 --duration 10 --output bench.json
+    python -m benchmarks.run --output new.json --compare bench.json
+
+Con `--supabase-url` y `--auth-base-url` se usan upstreams ya levantados
+(por ejemplo PostgREST sobre un Postgres local) en lugar del fake.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from benchmarks.datagen import DOCUMENT_BASE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CLINICAL_HISTORY_BODY = {
+    "stage_at_diagnosis": "II",
+    "tumor_aggressiveness": "Medium",
+    "treatment_access": "Adequate",
+    "follow_up_adherence": "Good",
+    "bmi": 24.5,
+}
+STAGES = ["I", "II", "III", "IV"]
+
+
+class Scenario:
+    def __init__(
+        self,
+        name: str,
+        method: str,
+        build: Optional[Callable[[int], dict]] = None,
+        setup: Optional[Callable[[httpx.AsyncClient, int, dict], Awaitable[dict]]] = None,
+    ):
+        self.name = name
+        self.method = method
+        # build(i) -> {"url": ..., "json": ...} para la i-ésima petición
+        self.build = build
+        # setup(client, i, headers) crea fuera del cronómetro el recurso que necesita la
+        # i-ésima petición (p. ej. el registro que se va a borrar) y devuelve la petición
+        self.setup = setup
+
+    async def request(self, client: httpx.AsyncClient, i: int, headers: dict) -> dict:
+        if self.setup is not None:
+            return await self.setup(client, i, headers)
+        return self.build(i)
+
+
+def build_scenarios(patients: int) -> List[Scenario]:
+    run_id = int(time.time())
+    # Contador propio: el índice de cada escenario se reinicia en cada nivel de concurrencia
+    patient_ids = itertools.count()
+
+    def seeded_document(i: int) -> str:
+        return str(DOCUMENT_BASE + i % patients)
+
+    def new_patient(i: int) -> dict:
+        return {"url": "/patients/", "json": {
+            "document_id": f"bench-{run_id}-{next(patient_ids)}",
+            "name": "Bench Patient",
+            "age": 50,
+            "gender": "Female",
+            "email": "bench@example.com",
+        }}
+
+    def new_history(i: int) -> dict:
+        return {"url": "/clinical_histories/", "json": {**CLINICAL_HISTORY_BODY, "document_id": seeded_document(i)}}
+
+    # Cada DELETE borra un registro creado solo para él: no depende de lo que hayan creado
+    # otros escenarios ni compite con otros usuarios concurrentes por el mismo id
+    async def delete_patient(client: httpx.AsyncClient, i: int, headers: dict) -> dict:
+        response = await client.post(**new_patient(i), headers=headers)
+        response.raise_for_status()
+        return {"url": f"/patients/{response.json()['document_id']}"}
+
+    async def delete_history(client: httpx.AsyncClient, i: int, headers: dict) -> dict:
+        response = await client.post(**new_history(i), headers=headers)
+        response.raise_for_status()
+        return {"url": f"/clinical_histories/{response.json()['id']}"}
+
+    return [
+        Scenario("POST /patients/", "POST", new_patient),
+        Scenario("GET /patients/{document_id}", "GET", lambda i: {"url": f"/patients/{seeded_document(i)}"}),
+        Scenario("GET /patients/", "GET", lambda i: {"url": "/patients/"}),
+        Scenario("GET /patients/?page&page_size", "GET", lambda i: {"url": "/patients/?page=1&page_size=50"}),
+        Scenario("GET /patients/summary", "GET", lambda i: {"url": "/patients/summary?limit=500"}),
+        Scenario("PATCH /patients/{document_id}", "PATCH",
+                 lambda i: {"url": f"/patients/{seeded_document(i)}", "json": {"age": 40 + i % 40}}),
+        Scenario("DELETE /patients/{document_id}", "DELETE", setup=delete_patient),
+        Scenario("POST /clinical_histories/", "POST", new_history),
+        Scenario("GET /clinical_histories/{history_id}", "GET",
+                 lambda i: {"url": f"/clinical_histories/{1 + i % patients}"}),
+        Scenario("GET /clinical_histories/document/{document_id}", "GET",
+                 lambda i: {"url": f"/clinical_histories/document/{seeded_document(i)}"}),
+        Scenario("PATCH /clinical_histories/{history_id}", "PATCH",
+                 lambda i: {"url": f"/clinical_histories/{1 + i % patients}", "json": {"bmi": 20 + i % 15}}),
+        Scenario("DELETE /clinical_histories/{history_id}", "DELETE", setup=delete_history),
+        Scenario("POST /clinical_histories/similar", "POST", lambda i: {"url": "/clinical_histories/similar?k=20", "json": {
+            **CLINICAL_HISTORY_BODY, "stage_at_diagnosis": STAGES[i % len(STAGES)],
+        }}),
+        Scenario("GET /clinical_histories/{history_id}/similar", "GET",
+                 lambda i: {"url": f"/clinical_histories/{1 + i % patients}/similar?k=20"}),
+    ]
+
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, concurrency: int, duration: float) -> dict:
+    counter = itertools.count()
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def user(index: int):
+        headers = {"Authorization": f"Bearer bench-{index}"}
+        while time.perf_counter() < deadline:
+            try:
+                request = await scenario.request(client, next(counter), headers)
+            except httpx.HTTPError as e:
+                # Fallo al preparar la petición: cuenta como error pero no como latencia
+                status = f"setup {type(e).__name__}"
+                statuses[status] = statuses.get(status, 0) + 1
+                continue
+            start = time.perf_counter()
+            try:
+                response = await client.request(scenario.method, request["url"], json=request.get("json"), headers=headers)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    errors = sum(count for status, count in statuses.items() if not status.startswith("2"))
+    to_ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "scenario": scenario.name,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "errors": errors,
+        "status_counts": statuses,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "p50_ms": to_ms(percentile(latencies, 0.50)),
+        "p95_ms": to_ms(percentile(latencies, 0.95)),
+        "p99_ms": to_ms(percentile(latencies, 0.99)),
+    }
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_up(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} did not come up in {timeout}s")
+
+
+def wait_until_similarity_ready(api_url: str, workers: int, timeout: float = 120.0) -> None:
+    """Espera a que el índice de similares esté cargado antes de cronometrar.
+
+    Cada worker construye su propio índice en segundo plano y responde 503
+    mientras tanto; se piden varias respuestas 200 seguidas para que, con
+    varios workers, no cuente solo el primero que termine.
+    """
+    headers = {"Authorization": "Bearer bench-warmup"}
+    deadline = time.monotonic() + timeout
+    streak = 0
+    while time.monotonic() < deadline:
+        response = httpx.get(f"{api_url}/clinical_histories/1/similar?k=1", headers=headers, timeout=10.0)
+        if response.status_code == 503 and "disabled" in response.text:
+            return
+        streak = streak + 1 if response.status_code == 200 else 0
+        if streak >= 4 * workers:
+            return
+        if streak == 0:
+            time.sleep(0.2)
+    raise RuntimeError(f"Similarity index did not finish building in {timeout}s")
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=ROOT, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict) -> str:
+    previous = {(r["scenario"], r["concurrency"]): r for r in baseline["results"]}
+    lines = [f"{'scenario':<50} {'conc':>4} {'rps':>10} {'p50':>10} {'p95':>10} {'p99':>10}"]
+
+    def delta(new, old):
+        if new is None or not old:
+            return "n/a"
+        return f"{(new - old) / old * 100:+.1f}%"
+
+    for result in current["results"]:
+        old = previous.get((result["scenario"], result["concurrency"]))
+        if old is None:
+            continue
+        lines.append(
+            f"{result['scenario']:<50} {result['concurrency']:>4} "
+            f"{delta(result['throughput_rps'], old['throughput_rps']):>10} "
+            f"{delta(result['p50_ms'], old['p50_ms']):>10} "
+            f"{delta(result['p95_ms'], old['p95_ms']):>10} "
+            f"{delta(result['p99_ms'], old['p99_ms']):>10}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated concurrency levels.")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per scenario and concurrency level.")
+    parser.add_argument("--scenarios", default="", help="Only run scenarios containing this text.")
+    parser.add_argument("--workers", type=int, default=1, help="Uvicorn workers for the API.")
+    parser.add_argument("--auth-latency-ms", type=float, default=5.0)
+    parser.add_argument("--db-latency-ms", type=float, default=1.0)
+    parser.add_argument("--patients", type=int, default=1000)
+    parser.add_argument("--mean-histories", type=float, default=3.0)
+    parser.add_argument("--supabase-url", help="Use an existing PostgREST instead of the fake one.")
+    parser.add_argument("--auth-base-url", help="Use an existing auth service instead of the fake one.")
+    parser.add_argument("--output", help="Write results as JSON to this file.")
+    parser.add_argument("--compare", help="Baseline JSON produced by a previous run.")
+    parser.add_argument("--verbose", action="store_true", help="Show the logs of the API and fake upstreams.")
+    args = parser.parse_args(argv)
+
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+    output = None if args.verbose else subprocess.DEVNULL
+    processes = []
+    try:
+        fake_url = None
+        if not (args.supabase_url and args.auth_base_url):
+            fake_port = free_port()
+            processes.append(subprocess.Popen([
+                sys.executable, "-m", "benchmarks.fake_upstreams",
+                "--port", str(fake_port),
+                "--auth-latency-ms", str(args.auth_latency_ms),
+                "--db-latency-ms", str(args.db_latency_ms),
+                "--patients", str(args.patients),
+                "--mean-histories", str(args.mean_histories),
+            ], cwd=ROOT, stdout=output, stderr=output))
+            fake_url = f"http://127.0.0.1:{fake_port}"
+            wait_until_up(f"{fake_url}/me")
+
+        api_port = free_port()
+        env = {
+            **os.environ,
+            "SUPABASE_URL": args.supabase_url or fake_url,
+            "SUPABASE_SERVICE_ROLE_KEY": os.environ.get("SUPABASE_SERVICE_ROLE_KEY", "bench-service-role-key"),
+            "AUTH_BASE_URL": args.auth_base_url or fake_url,
+        }
+        processes.append(subprocess.Popen([
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--host", "127.0.0.1", "--port", str(api_port),
+            "--workers", str(args.workers), "--log-level", "warning",
+        ], cwd=ROOT, env=env, stdout=output, stderr=output))
+        api_url = f"http://127.0.0.1:{api_port}"
+        wait_until_up(f"{api_url}/")
+
+        scenarios = build_scenarios(args.patients)
+        scenarios = [s for s in scenarios if args.scenarios in s.name]
+        if any("similar" in s.name for s in scenarios):
+            wait_until_similarity_ready(api_url, args.workers)
+
+        async def run_all() -> List[dict]:
+            limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+            async with httpx.AsyncClient(base_url=api_url, limits=limits, timeout=30.0) as client:
+                results = []
+                for scenario in scenarios:
+                    for level in levels:
+                        result = await run_scenario(client, scenario, level, args.duration)
+                        results.append(result)
+                        print(
+                            f"{result['scenario']:<50} c={level:<4} {result['throughput_rps']:>9.1f} rps  "
+                            f"p50={result['p50_ms']}ms p95={result['p95_ms']}ms p99={result['p99_ms']}ms "
+                            f"errors={result['errors']}",
+                            flush=True,
+                        )
+                return results
+
+        report = {
+            "commit": git_commit(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "parameters": {
+                "concurrency": levels,
+                "duration_s": args.duration,
+                "workers": args.workers,
+                "auth_latency_ms": args.auth_latency_ms,
+                "db_latency_ms": args.db_latency_ms,
+                "patients": args.patients,
+                "mean_histories": args.mean_histories,
+                "fake_upstreams": fake_url is not None,
+            },
+            "results": asyncio.run(run_all()),
+        }
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            process.wait()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            print(compare(report, json.load(f)))
+    return report
+
+
+if __name__ == "__main__":
+    main()
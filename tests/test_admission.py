@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import AdmissionControlMiddleware, ConcurrencyBudget
+
+
+async def noop_app(scope, receive, send):
+    pass
+
+
+@pytest.fixture
+def middleware():
+    return AdmissionControlMiddleware(noop_app)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/patients",
+        "/patients/",
+        "/patients/summary",
+        "/patients/summary/",
+        "/clinical_histories/document/12345",
+        "/clinical_histories/similar",
+        "/clinical_histories/42/similar",
+        "/patients/export",
+        "/clinical_histories/bulk/update",
+    ],
+)
+def test_expensive_routes(middleware, path):
+    assert middleware._budget_for(path) is middleware.expensive
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/patients/12345",
+        "/patients/summary-report",
+        "/clinical_histories/",
+        "/clinical_histories/42",
+        "/clinical_histories/document",
+        "/patients/exporter",
+    ],
+)
+def test_cheap_routes(middleware, path):
+    assert middleware._budget_for(path) is middleware.cheap
+
+
+def test_budget_queues_and_hands_over_slots():
+    async def scenario():
+        budget = ConcurrencyBudget("test", max_in_flight=1, max_queue=1)
+        assert await budget.acquire(0.1)
+        waiter = asyncio.ensure_future(budget.acquire(1.0))
+        await asyncio.sleep(0)
+        assert budget.queued == 1
+        # Cola llena: se rechaza sin esperar
+        assert not await budget.acquire(1.0)
+        budget.release()
+        assert await waiter
+        assert budget.in_flight == 1
+        budget.release()
+        assert budget.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_budget_times_out_in_queue():
+    async def scenario():
+        budget = ConcurrencyBudget("test", max_in_flight=1, max_queue=4)
+        assert await budget.acquire(0.1)
+        assert not await budget.acquire(0.01)
+        assert budget.queued == 0
+
+    asyncio.run(scenario())
+
+
+def http_scope(path: str, token: str = "Bearer a") -> dict:
+    return {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "headers": [(b"authorization", token.encode())],
+        "client": ("127.0.0.1", 1234),
+    }
+
+
+def test_per_token_limit_returns_429():
+    sent = []
+
+    async def scenario():
+        gate = asyncio.Event()
+
+        async def slow_app(scope, receive, send):
+            await gate.wait()
+
+        async def send(message):
+            sent.append(message)
+
+        middleware = AdmissionControlMiddleware(slow_app, per_token_max_in_flight=1)
+        first = asyncio.ensure_future(middleware(http_scope("/patients/1"), None, send))
+        await asyncio.sleep(0)
+        await middleware(http_scope("/patients/2"), None, send)
+        gate.set()
+        await first
+        # Otro token no comparte el límite
+        await middleware(http_scope("/patients/3", token="Bearer b"), None, send)
+
+    asyncio.run(scenario())
+    assert [m["status"] for m in sent if m["type"] == "http.response.start"] == [429]
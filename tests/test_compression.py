@@ -0,0 +1,137 @@
+import gzip
+
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.routing import Route
+from starlette.testclient import TestClient
+
+from app.core import compression
+from app.core.compression import CompressionMiddleware, _Compressor, negotiate
+
+SUPPORTED = ["zstd", "br", "gzip"]
+BIG = {"items": [{"id": i, "name": f"patient {i}"} for i in range(500)]}
+
+
+@pytest.mark.parametrize(
+    "accept, expected",
+    [
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("gzip, br;q=0.9", "gzip"),
+        ("GZIP;Q=0.5, deflate", "gzip"),
+        ("*", "zstd"),
+        ("*, zstd;q=0", "br"),
+        ("br;q=0, *;q=0.1", "zstd"),
+        ("identity", None),
+        ("gzip;q=0", None),
+        ("gzip;q=abc", None),
+        ("", None),
+    ],
+)
+def test_negotiate(accept, expected):
+    assert negotiate(accept, SUPPORTED) == expected
+
+
+def test_negotiate_only_offers_supported_encodings():
+    assert negotiate("zstd, br", ["gzip"]) is None
+    assert negotiate("*", ["gzip"]) == "gzip"
+
+
+def test_compressor_interface_is_abstract():
+    class Incomplete(_Compressor):
+        def compress(self, data):
+            return data
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+async def stream():
+    for i in range(20):
+        yield (f"row {i} " * 50 + "\n").encode()
+
+
+@pytest.fixture
+def client():
+    routes = [
+        Route("/big", lambda request: JSONResponse(BIG)),
+        Route("/small", lambda request: JSONResponse({"ok": True})),
+        Route("/stream", lambda request: StreamingResponse(stream(), media_type="text/csv")),
+        Route("/image", lambda request: Response(b"\x89PNG" * 1000, media_type="image/png")),
+        Route("/vary", lambda request: PlainTextResponse("x" * 2000, headers={"Vary": "Origin"})),
+    ]
+    app = CompressionMiddleware(Starlette(routes=routes), minimum_size=1024)
+    return TestClient(app)
+
+
+def raw_get(client, path, accept_encoding=None, method="GET"):
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {"Accept-Encoding": ""}
+    with client.stream(method, path, headers=headers) as response:
+        return response, b"".join(response.iter_raw())
+
+
+def test_gzip_one_shot_body(client):
+    response, body = raw_get(client, "/big", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) == len(body)
+    assert gzip.decompress(body) == JSONResponse(BIG).body
+
+
+def test_streaming_body_is_compressed_incrementally(client):
+    response, body = raw_get(client, "/stream", "gzip")
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert gzip.decompress(body) == b"".join((f"row {i} " * 50 + "\n").encode() for i in range(20))
+
+
+@pytest.mark.parametrize("module, encoding", [("brotli", "br"), ("zstandard", "zstd")])
+def test_optional_codecs(client, module, encoding):
+    codec = pytest.importorskip(module)
+    response, body = raw_get(client, "/big", encoding)
+    assert response.headers["content-encoding"] == encoding
+    if encoding == "br":
+        data = codec.decompress(body)
+    else:
+        data = codec.ZstdDecompressor().decompressobj().decompress(body)
+    assert data == JSONResponse(BIG).body
+
+
+def test_small_response_is_not_compressed_but_varies(client):
+    response, body = raw_get(client, "/small", "gzip")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == b'{"ok":true}'
+
+
+@pytest.mark.parametrize("accept_encoding", [None, "identity"])
+def test_vary_without_negotiated_encoding(client, accept_encoding):
+    response, body = raw_get(client, "/big", accept_encoding)
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert body == JSONResponse(BIG).body
+
+
+def test_head_is_not_compressed_but_varies(client):
+    response, _ = raw_get(client, "/big", "gzip", method="HEAD")
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_incompressible_content_type_is_untouched(client):
+    response, body = raw_get(client, "/image", "gzip")
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert len(body) == 4000
+
+
+def test_existing_vary_is_preserved(client):
+    response, _ = raw_get(client, "/vary", "gzip")
+    assert response.headers["vary"] == "Origin, Accept-Encoding"
+
+
+def test_unavailable_encodings_are_not_offered(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+    monkeypatch.setattr(compression, "zstandard", None)
+    assert list(compression.available_encodings()) == ["gzip"]
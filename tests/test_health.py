@@ -0,0 +1,44 @@
+import threading
+import time
+
+import pytest
+
+from app.core import health
+
+
+@pytest.fixture
+def checks(monkeypatch):
+    release = threading.Event()
+
+    def ok():
+        pass
+
+    def hangs():
+        release.wait(5)
+
+    def fails():
+        raise ConnectionError("refused")
+
+    monkeypatch.setattr(health, "CHECKS", {"database": hangs, "auth": fails, "other": ok})
+    monkeypatch.setattr(health, "READINESS_TIMEOUT_SECONDS", 0.2)
+    monkeypatch.setattr(health, "READINESS_CACHE_SECONDS", 0.0)
+    monkeypatch.setattr(health, "_check_executor", health.ThreadPoolExecutor(max_workers=3))
+    yield
+    release.set()
+
+
+def test_warm_up_is_bounded_by_readiness_timeout(checks):
+    hooks = []
+    start = time.monotonic()
+    health.warm_up(lambda: hooks.append("ran"))
+    assert time.monotonic() - start < 1.0
+    assert hooks == ["ran"]
+
+
+def test_readiness_reports_each_check(checks):
+    health.warm_up()
+    ready, results = health.readiness()
+    assert not ready
+    assert results["database"]["error"].startswith("timed out")
+    assert results["auth"]["error"] == "ConnectionError: refused"
+    assert results["other"]["ok"]
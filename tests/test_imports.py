@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Dependencias pesadas que solo se importan en el primer uso (ver benchmarks/import_time.py)
+DEFERRED = ["numpy", "supabase", "app.services.similarity_service"]
+
+
+def test_app_import_defers_heavy_dependencies():
+    code = f"import sys, app.main; print([m for m in {DEFERRED!r} if m in sys.modules])"
+    env = {**os.environ, "SUPABASE_URL": "http://127.0.0.1:1", "SUPABASE_SERVICE_ROLE_KEY": "test"}
+    completed = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert completed.returncode == 0, completed.stderr
+    assert completed.stdout.strip() == "[]"
@@ -0,0 +1,41 @@
+import pytest
+
+from app.core.metrics import Counter, Gauge, Histogram, _Metric
+
+
+def test_metric_without_samples_cannot_be_instantiated():
+    class Incomplete(_Metric):
+        kind = "counter"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete_total", "Missing samples.")
+
+
+def test_counter_and_gauge_render_labelled_series():
+    counter = Counter("requests_total", "Requests.", ("route",))
+    counter.inc(route="/a")
+    counter.inc(2, route="/a")
+    gauge = Gauge("in_flight", "In flight.")
+    gauge.inc()
+    gauge.dec()
+
+    assert counter.render().splitlines() == [
+        "# HELP requests_total Requests.",
+        "# TYPE requests_total counter",
+        'requests_total{route="/a"} 3',
+    ]
+    assert gauge.samples() == ["in_flight 0"]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 2.0):
+        histogram.observe(value)
+
+    assert histogram.samples() == [
+        'latency_seconds_bucket{le="0.1"} 2',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+        "latency_seconds_sum 2.65",
+        "latency_seconds_count 4",
+    ]
@@ -0,0 +1,153 @@
+import json
+from typing import List
+
+import pytest
+
+from app.jobs import rescore
+from app.jobs.scorers import DummyScorer, Scorer, load_scorer, resolve_scorer
+
+
+class IncompleteScorer(Scorer):
+    name = "incomplete"
+
+
+class NotAScorer:
+    def score(self, histories):
+        return []
+
+
+class FakeHistories:
+    """Tabla clinical_histories en memoria con la interfaz de ClinicalHistoryService que usa el job."""
+
+    def __init__(self, count: int):
+        self.rows = {
+            i: {"id": i, "stage_at_diagnosis": "III", "tumor_aggressiveness": "High", "treatment_id": None, "treatment_recommendation": None}
+            for i in range(1, count + 1)
+        }
+        self.batches: List[List[int]] = []
+        self.fail_after_batches = None
+
+    def scan_clinical_histories(self, columns, after_id, limit, edited_since=None):
+        ids = sorted(i for i in self.rows if i > after_id)[:limit]
+        return [dict(self.rows[i]) for i in ids]
+
+    def count_clinical_histories(self, after_id=0):
+        return sum(1 for i in self.rows if i > after_id)
+
+    def update_recommendations(self, updates):
+        if self.fail_after_batches is not None and len(self.batches) >= self.fail_after_batches:
+            raise KeyboardInterrupt
+        for update in updates:
+            self.rows[update["id"]].update(update)
+        self.batches.append([update["id"] for update in updates])
+        return len(updates)
+
+
+@pytest.fixture
+def histories(monkeypatch):
+    fake = FakeHistories(25)
+    for name in ("scan_clinical_histories", "count_clinical_histories", "update_recommendations"):
+        monkeypatch.setattr(rescore.ClinicalHistoryService, name, getattr(fake, name))
+    return fake
+
+
+@pytest.fixture
+def checkpoint(tmp_path):
+    return str(tmp_path / "rescore.checkpoint.json")
+
+
+def run(checkpoint, **kwargs):
+    return rescore.run("dummy", checkpoint, workers=0, chunk_size=10, progress_interval=3600, **kwargs)
+
+
+def test_resolve_scorer_rejects_incomplete_scorers():
+    assert resolve_scorer("dummy") is DummyScorer
+    assert isinstance(load_scorer("app.jobs.scorers:DummyScorer"), DummyScorer)
+    with pytest.raises(ValueError, match="does not implement score"):
+        resolve_scorer(f"{__name__}:IncompleteScorer")
+    with pytest.raises(ValueError, match="not a subclass"):
+        resolve_scorer(f"{__name__}:NotAScorer")
+    with pytest.raises(ValueError, match="Unknown scorer"):
+        resolve_scorer("missing")
+    with pytest.raises(TypeError):
+        IncompleteScorer()
+
+
+def test_score_chunk_returns_only_changed_rows():
+    rescore._init_worker("dummy", {})
+    rows = [
+        {"id": 1, "stage_at_diagnosis": "I", "tumor_aggressiveness": "Low", "treatment_id": 1, "treatment_recommendation": "T1"},
+        {"id": 2, "stage_at_diagnosis": "IV", "tumor_aggressiveness": "High", "treatment_id": 1, "treatment_recommendation": "T1"},
+    ]
+    assert rescore._score_chunk(rows) == [{"id": 2, "treatment_id": 5, "treatment_recommendation": "T5"}]
+
+
+def test_run_scores_every_history_and_finishes(histories, checkpoint):
+    state = run(checkpoint)
+    assert state["finished"]
+    assert (state["processed"], state["updated"], state["last_id"]) == (25, 25, 25)
+    assert histories.batches == [list(range(1, 11)), list(range(11, 21)), list(range(21, 26))]
+    assert all(row["treatment_recommendation"] == "T5" for row in histories.rows.values())
+    with open(checkpoint) as f:
+        assert json.load(f)["finished"]
+
+
+def test_resume_continues_after_last_written_chunk(histories, checkpoint):
+    histories.fail_after_batches = 1
+    with pytest.raises(KeyboardInterrupt):
+        run(checkpoint)
+    with open(checkpoint) as f:
+        saved = json.load(f)
+    assert (saved["last_id"], saved["processed"], saved["finished"]) == (10, 10, False)
+
+    with pytest.raises(RuntimeError, match="--resume"):
+        run(checkpoint)
+
+    histories.fail_after_batches = None
+    state = run(checkpoint, resume=True)
+    assert state["finished"]
+    assert (state["processed"], state["updated"]) == (25, 25)
+    # Ninguna historia se escribe dos veces
+    written = [history_id for batch in histories.batches for history_id in batch]
+    assert sorted(written) == list(range(1, 26))
+
+
+def test_resume_of_finished_job_does_nothing(histories, checkpoint):
+    run(checkpoint)
+    batches = len(histories.batches)
+    assert run(checkpoint, resume=True)["finished"]
+    assert len(histories.batches) == batches
+
+
+def test_restart_ignores_checkpoint(histories, checkpoint):
+    run(checkpoint)
+    state = run(checkpoint, restart=True)
+    # Todo está ya puntuado: se recorre de nuevo sin escribir nada
+    assert (state["processed"], state["updated"]) == (25, 0)
+
+
+def test_resume_with_another_scorer_version_fails(histories, checkpoint, monkeypatch):
+    histories.fail_after_batches = 1
+    with pytest.raises(KeyboardInterrupt):
+        run(checkpoint)
+    monkeypatch.setattr(DummyScorer, "version", "2")
+    with pytest.raises(RuntimeError, match="v1"):
+        run(checkpoint, resume=True)
+
+
+def test_dry_run_writes_nothing(histories, checkpoint):
+    state = run(checkpoint, dry_run=True)
+    assert (state["processed"], state["updated"]) == (25, 25)
+    assert histories.batches == []
+    assert all(row["treatment_id"] is None for row in histories.rows.values())
+    with pytest.raises(FileNotFoundError):
+        open(checkpoint)
+
+
+def test_checkpoint_save_is_atomic(tmp_path):
+    path = str(tmp_path / "state.json")
+    checkpoint = rescore.Checkpoint(path)
+    assert checkpoint.load() is None
+    checkpoint.save({"last_id": 7})
+    assert checkpoint.load()["last_id"] == 7
+    assert not (tmp_path / "state.json.tmp").exists()
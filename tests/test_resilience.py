@@ -0,0 +1,271 @@
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+
+from app.core import resilience
+from app.core.resilience import (
+    CLOSED,
+    HALF_OPEN,
+    OPEN,
+    CircuitBreaker,
+    CircuitOpenError,
+    call_with_retry,
+    is_retryable_error,
+    is_transient_error,
+)
+
+REQUEST = httpx.Request("GET", "http://auth.test/me")
+
+
+def http_status_error(status_code: int) -> httpx.HTTPStatusError:
+    response = httpx.Response(status_code, request=REQUEST)
+    return httpx.HTTPStatusError(f"{status_code}", request=REQUEST, response=response)
+
+
+def api_error(code) -> APIError:
+    return APIError({"message": "error", "code": code, "hint": None, "details": None})
+
+
+# Errores del servicio de auth (httpx)
+AUTH_TRANSIENT = [
+    http_status_error(500),
+    http_status_error(503),
+    httpx.ConnectError("refused", request=REQUEST),
+    httpx.ReadTimeout("timeout", request=REQUEST),
+]
+AUTH_CLIENT = [http_status_error(400), http_status_error(404), ValueError("bad payload")]
+
+# Errores de Supabase (postgrest)
+DATABASE_TRANSIENT = [
+    api_error(502),  # respuesta sin JSON: el código es el status HTTP
+    api_error("503"),
+    api_error("PGRST000"),
+    api_error("PGRST003"),
+    api_error("08006"),
+    api_error("53300"),
+    api_error("57014"),
+    api_error("40001"),
+    api_error("40P01"),
+]
+DATABASE_CLIENT = [
+    api_error("PGRST116"),
+    api_error("PGRST204"),
+    api_error("PGRST301"),
+    api_error("23505"),
+    api_error("23503"),
+    api_error("22P02"),
+    api_error("42P01"),
+    api_error("204"),
+    api_error(None),
+]
+
+
+@pytest.mark.parametrize("exc", AUTH_TRANSIENT + DATABASE_TRANSIENT, ids=repr)
+def test_transient_errors(exc):
+    assert is_transient_error(exc)
+
+
+@pytest.mark.parametrize("exc", AUTH_CLIENT + DATABASE_CLIENT, ids=repr)
+def test_client_errors_are_not_transient(exc):
+    assert not is_transient_error(exc)
+    assert not is_retryable_error(exc)
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [httpx.ReadTimeout("timeout", request=REQUEST), httpx.ConnectTimeout("timeout", request=REQUEST), api_error("57014"), api_error("PGRST003")],
+    ids=repr,
+)
+def test_timeouts_are_not_retried(exc):
+    assert is_transient_error(exc)
+    assert not is_retryable_error(exc)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: now[0])
+    return now
+
+
+def make_breaker(name: str) -> CircuitBreaker:
+    return CircuitBreaker(
+        name,
+        window_size=4,
+        minimum_calls=4,
+        failure_rate_threshold=0.5,
+        slow_call_seconds=1.0,
+        slow_call_rate_threshold=0.5,
+        open_seconds=10.0,
+        half_open_max_calls=2,
+    )
+
+
+def fail_with(exc):
+    def func():
+        raise exc
+    return func
+
+
+def ok():
+    return "ok"
+
+
+@pytest.mark.parametrize(
+    "name, errors",
+    [("auth", AUTH_TRANSIENT), ("database", DATABASE_TRANSIENT)],
+)
+def test_breaker_opens_on_transient_errors(clock, name, errors):
+    for exc in errors:
+        breaker = make_breaker(name)
+        breaker.call(ok)
+        breaker.call(ok)
+        for _ in range(2):
+            with pytest.raises(type(exc)):
+                breaker.call(fail_with(exc))
+        assert breaker.state == OPEN, exc
+        with pytest.raises(CircuitOpenError):
+            breaker.call(ok)
+
+
+@pytest.mark.parametrize(
+    "name, errors",
+    [("auth", AUTH_CLIENT), ("database", DATABASE_CLIENT)],
+)
+def test_breaker_ignores_client_errors(clock, name, errors):
+    breaker = make_breaker(name)
+    for exc in errors:
+        with pytest.raises(type(exc)):
+            breaker.call(fail_with(exc))
+    assert breaker.state == CLOSED
+    assert breaker.call(ok) == "ok"
+
+
+def test_breaker_opens_on_slow_calls(clock):
+    breaker = make_breaker("database")
+
+    def slow():
+        clock[0] += 1.5
+        return "ok"
+
+    breaker.call(ok)
+    breaker.call(ok)
+    breaker.call(slow)
+    assert breaker.state == CLOSED
+    breaker.call(slow)
+    assert breaker.state == OPEN
+
+
+def test_breaker_waits_for_minimum_calls(clock):
+    breaker = make_breaker("database")
+    for _ in range(3):
+        with pytest.raises(APIError):
+            breaker.call(fail_with(api_error("PGRST000")))
+    assert breaker.state == CLOSED
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    for _ in range(4):
+        with pytest.raises(httpx.ConnectError):
+            breaker.call(fail_with(httpx.ConnectError("refused", request=REQUEST)))
+    assert breaker.state == OPEN
+
+
+def test_breaker_half_open_closes_after_successful_probes(clock):
+    breaker = make_breaker("auth")
+    open_breaker(breaker)
+    clock[0] += 9.0
+    with pytest.raises(CircuitOpenError) as info:
+        breaker.call(ok)
+    assert info.value.retry_after == pytest.approx(1.0)
+
+    clock[0] += 1.0
+    assert breaker.state == HALF_OPEN
+    breaker.call(ok)
+    assert breaker.state == HALF_OPEN
+    breaker.call(ok)
+    assert breaker.state == CLOSED
+
+
+def test_breaker_half_open_reopens_on_failed_probe(clock):
+    breaker = make_breaker("database")
+    open_breaker(breaker)
+    clock[0] += 10.0
+    with pytest.raises(APIError):
+        breaker.call(fail_with(api_error("503")))
+    assert breaker.state == OPEN
+
+
+def test_breaker_half_open_limits_probes(clock):
+    breaker = make_breaker("auth")
+    open_breaker(breaker)
+    clock[0] += 10.0
+    assert breaker.before_call()
+    assert breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+class Flaky:
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    delays = []
+    monkeypatch.setattr(resilience.time, "sleep", delays.append)
+    monkeypatch.setattr(resilience, "RETRY_MAX_ATTEMPTS", 3)
+    return delays
+
+
+def test_retry_recovers_from_transient_errors(no_sleep):
+    func = Flaky(http_status_error(503), api_error("PGRST000"))
+    assert call_with_retry(CircuitBreaker("test"), func) == "ok"
+    assert func.calls == 3
+    assert len(no_sleep) == 2
+
+
+def test_retry_gives_up_after_max_attempts(no_sleep):
+    func = Flaky(*(api_error("08006") for _ in range(5)))
+    with pytest.raises(APIError):
+        call_with_retry(CircuitBreaker("test"), func)
+    assert func.calls == 3
+
+
+@pytest.mark.parametrize(
+    "exc",
+    [http_status_error(404), api_error("23505"), httpx.ReadTimeout("timeout", request=REQUEST), api_error("57014")],
+    ids=repr,
+)
+def test_retry_does_not_repeat_client_errors_or_timeouts(no_sleep, exc):
+    func = Flaky(exc)
+    with pytest.raises(type(exc)):
+        call_with_retry(CircuitBreaker("test"), func)
+    assert func.calls == 1
+    assert no_sleep == []
+
+
+def test_retry_stops_when_circuit_is_open(no_sleep, clock):
+    breaker = make_breaker("auth")
+    open_breaker(breaker)
+    func = Flaky()
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(breaker, func)
+    assert func.calls == 0
+
+
+def test_backoff_delay_is_capped(monkeypatch):
+    monkeypatch.setattr(resilience.random, "uniform", lambda low, high: high)
+    monkeypatch.setattr(resilience, "RETRY_BASE_DELAY_SECONDS", 0.1)
+    monkeypatch.setattr(resilience, "RETRY_MAX_DELAY_SECONDS", 1.0)
+    assert resilience.backoff_delay(0) == pytest.approx(0.1)
+    assert resilience.backoff_delay(2) == pytest.approx(0.4)
+    assert resilience.backoff_delay(10) == pytest.approx(1.0)
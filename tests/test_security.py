@@ -0,0 +1,74 @@
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core import security
+from app.core.resilience import CircuitBreaker, CircuitOpenError
+
+REQUEST = httpx.Request("GET", "http://auth.test/me")
+
+
+@pytest.fixture
+def auth(monkeypatch):
+    """Servicio de auth simulado: `responses` es lo que devuelve (o lanza) cada llamada."""
+    calls = {"responses": []}
+
+    def call(url, token):
+        result = calls["responses"].pop(0)
+        if isinstance(result, Exception):
+            raise result
+        if result.status_code >= 500:
+            result.raise_for_status()
+        return result
+
+    monkeypatch.setattr(security, "AUTH_BASE_URL", "http://auth.test")
+    monkeypatch.setattr(security, "_call_auth_service", call)
+    monkeypatch.setattr(security, "get_breaker", lambda name: CircuitBreaker(name, minimum_calls=100))
+    monkeypatch.setattr("app.core.resilience.time.sleep", lambda seconds: None)
+    return calls
+
+
+def response(status_code: int, json=None) -> httpx.Response:
+    return httpx.Response(status_code, json=json, request=REQUEST)
+
+
+def validate():
+    with pytest.raises(HTTPException) as info:
+        security._validate_token_with_auth_service("token")
+    return info.value
+
+
+def test_valid_token_returns_user(auth):
+    auth["responses"] = [response(200, {"id": "user-1"})]
+    assert security._validate_token_with_auth_service("token") == {"id": "user-1"}
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 403])
+def test_rejected_token_is_forbidden(auth, status_code):
+    auth["responses"] = [response(status_code)]
+    assert validate().status_code == 403
+
+
+@pytest.mark.parametrize(
+    "failure",
+    [
+        response(503),
+        httpx.ConnectError("refused", request=REQUEST),
+        httpx.ReadTimeout("timeout", request=REQUEST),
+    ],
+)
+def test_auth_outage_is_unavailable_not_forbidden(auth, failure):
+    auth["responses"] = [failure] * 3
+    error = validate()
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "1"
+
+
+def test_open_circuit_is_unavailable(auth, monkeypatch):
+    def open_circuit(url, token):
+        raise CircuitOpenError("auth", 12.5)
+
+    monkeypatch.setattr(security, "call_with_retry", lambda breaker, func, *args: open_circuit(*args))
+    error = validate()
+    assert error.status_code == 503
+    assert error.headers["Retry-After"] == "13"
@@ -0,0 +1,123 @@
+import os
+
+import pytest
+
+from app.core import shared_cache
+from app.core.shared_cache import PROBES, SharedCache
+
+pytestmark = pytest.mark.skipif(shared_cache.fcntl is None, reason="shared cache needs fcntl")
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "cache")
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(shared_cache.time, "time", lambda: now[0])
+    return now
+
+
+def open_cache(path, slots=64, slot_size=128):
+    return SharedCache(path, slots, slot_size)
+
+
+def test_set_get_and_ttl_expiry(path, clock):
+    cache = open_cache(path)
+    assert cache.set("token", "abc", {"id": "user-1"}, ttl=60)
+    assert cache.get("token", "abc") == {"id": "user-1"}
+    # Mismo key en otro namespace es otra entrada
+    assert cache.get("patient", "abc") is None
+    clock[0] += 59
+    assert cache.get("token", "abc") == {"id": "user-1"}
+    clock[0] += 1
+    assert cache.get("token", "abc") is None
+
+
+def test_full_window_evicts_entry_that_expires_first(path, clock, monkeypatch):
+    # Todas las claves caen en el mismo slot inicial: comparten la ventana de sondeo
+    monkeypatch.setattr(SharedCache, "_window", lambda self, digest: (
+        shared_cache.HEADER_SIZE + i * self.slot_size for i in range(PROBES)
+    ))
+    cache = open_cache(path)
+    for i in range(PROBES):
+        assert cache.set("ns", f"k{i}", i, ttl=100 + i)
+    # k3 expira antes que el resto
+    cache.set("ns", "k3", 3, ttl=1)
+    assert cache.set("ns", "new", "value", ttl=100)
+    assert cache.get("ns", "new") == "value"
+    assert cache.get("ns", "k3") is None
+    assert [cache.get("ns", f"k{i}") for i in range(PROBES) if i != 3] == [i for i in range(PROBES) if i != 3]
+
+
+def test_expired_slot_is_reused_before_evicting(path, clock, monkeypatch):
+    monkeypatch.setattr(SharedCache, "_window", lambda self, digest: (
+        shared_cache.HEADER_SIZE + i * self.slot_size for i in range(PROBES)
+    ))
+    cache = open_cache(path)
+    for i in range(PROBES):
+        cache.set("ns", f"k{i}", i, ttl=10 if i == 5 else 100)
+    clock[0] += 20
+    cache.set("ns", "new", "value", ttl=100)
+    assert cache.get("ns", "new") == "value"
+    assert all(cache.get("ns", f"k{i}") == i for i in range(PROBES) if i != 5)
+
+
+def test_oversize_value_deletes_previous_entry(path, clock):
+    cache = open_cache(path, slot_size=64)
+    assert cache.set("patient", "1", {"name": "a"}, ttl=60)
+    assert not cache.set("patient", "1", {"name": "x" * 100}, ttl=60)
+    assert cache.get("patient", "1") is None
+
+
+def test_instances_on_same_file_share_entries_and_deletes(path, clock):
+    first, second = open_cache(path), open_cache(path)
+    first.set("patient", "1", {"name": "a"}, ttl=60)
+    assert second.get("patient", "1") == {"name": "a"}
+    second.delete("patient", "1")
+    assert first.get("patient", "1") is None
+    first.close()
+    second.close()
+
+
+def test_other_configuration_resets_file(path, clock):
+    open_cache(path).set("ns", "k", 1, ttl=60)
+    assert open_cache(path, slots=32).get("ns", "k") is None
+
+
+@pytest.mark.parametrize("mode", [0o666, 0o640, 0o604])
+def test_refuses_file_accessible_to_other_users(path, mode):
+    open_cache(path).close()
+    os.chmod(path, mode)
+    with pytest.raises(PermissionError):
+        open_cache(path)
+
+
+def test_refuses_file_owned_by_another_user(path, monkeypatch):
+    open_cache(path).close()
+    other_uid = os.geteuid() + 1
+    monkeypatch.setattr(shared_cache.os, "geteuid", lambda: other_uid)
+    with pytest.raises(PermissionError):
+        open_cache(path)
+
+
+@pytest.mark.skipif(not hasattr(os, "O_NOFOLLOW"), reason="O_NOFOLLOW not available")
+def test_refuses_symlink(path, tmp_path):
+    target = tmp_path / "elsewhere"
+    target.write_bytes(b"")
+    os.symlink(target, path)
+    with pytest.raises(OSError):
+        open_cache(path)
+
+
+def test_untrusted_file_disables_cache(path, monkeypatch):
+    open_cache(path).close()
+    os.chmod(path, 0o666)
+    monkeypatch.setattr(shared_cache, "SHARED_CACHE_ENABLED", True)
+    monkeypatch.setattr(shared_cache, "SHARED_CACHE_PATH", path)
+    monkeypatch.setattr(shared_cache, "_cache", None)
+    monkeypatch.setattr(shared_cache, "_cache_failed", False)
+    assert shared_cache.get_shared_cache() is None
+    assert shared_cache.cache_get("token", "abc") is None
@@ -0,0 +1,251 @@
+import numpy as np
+import pytest
+
+from app.services import similarity_service
+from app.services.similarity_service import (
+    DIMENSIONS,
+    BruteForceIndex,
+    IndexWarmingUpError,
+    PartitionedIndex,
+    SimilarityIndex,
+    encode,
+)
+
+
+def naive_distances(vectors, query, weights):
+    return (((vectors - query) ** 2) * weights).sum(axis=1)
+
+
+def random_vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIMENSIONS), dtype=np.float32)
+
+
+def test_encode_scales_features_and_masks_missing_ones():
+    vectors, mask = encode([
+        {"stage_at_diagnosis": "IV", "family_history": "No", "diet_type": "Vegan", "bmi": 35},
+        {"stage_at_diagnosis": "unknown"},
+    ])
+    slices = similarity_service._SLICES
+    assert vectors.shape == (2, DIMENSIONS)
+    assert vectors[0, slices["stage_at_diagnosis"]] == pytest.approx(1.0)
+    assert vectors[0, slices["family_history"]] == 0.0 and mask[0, slices["family_history"]].all()
+    assert vectors[0, slices["diet_type"]].tolist() == pytest.approx([0, 0.5 ** 0.5, 0, 0, 0])
+    assert mask[0, slices["diet_type"]].all()
+    assert vectors[0, slices["bmi"]] == pytest.approx(1.0)
+    # Valores desconocidos o ausentes no cuentan
+    assert not mask[1].any()
+
+
+def test_brute_force_search_matches_naive_distances():
+    vectors = random_vectors(300)
+    ids = np.arange(1, 301, dtype=np.int64)
+    index = BruteForceIndex(capacity=16)
+    index.upsert(ids, vectors)
+    query = random_vectors(1, seed=1)[0]
+    weights = (np.arange(DIMENSIONS) % 2).astype(np.float32)
+
+    found, distances = index.search(query, weights, 10)
+
+    expected = naive_distances(vectors, query, weights)
+    assert found.tolist() == (ids[np.argsort(expected, kind="stable")[:10]]).tolist()
+    assert distances == pytest.approx(np.sort(expected)[:10], abs=1e-4)
+
+
+def test_brute_force_upsert_replaces_and_remove_compacts():
+    index = BruteForceIndex(capacity=2)
+    vectors = random_vectors(3)
+    index.upsert(np.array([10, 20, 30]), vectors)
+    assert len(index) == 3
+
+    # Un cambio reutiliza la fila de la historia
+    index.upsert(np.array([20]), vectors[:1])
+    assert len(index) == 3
+    weights = np.ones(DIMENSIONS, dtype=np.float32)
+    found, distances = index.search(vectors[0], weights, 2)
+    assert sorted(found.tolist()) == [10, 20]
+    assert distances.tolist() == pytest.approx([0.0, 0.0], abs=1e-5)
+
+    assert index.remove(10)
+    assert not index.remove(10)
+    assert len(index) == 2
+    found, _ = index.search(vectors[2], weights, 5)
+    assert sorted(found.tolist()) == [20, 30]
+    # La última fila se movió al hueco y sigue siendo localizable
+    assert index.remove(30)
+    assert index.search(vectors[0], weights, 5)[0].tolist() == [20]
+
+
+def test_brute_force_empty_index():
+    index = BruteForceIndex()
+    found, distances = index.search(np.zeros(DIMENSIONS, dtype=np.float32), np.ones(DIMENSIONS, dtype=np.float32), 5)
+    assert len(found) == 0 and len(distances) == 0
+
+
+def test_partitioned_index_with_every_probe_is_exact():
+    vectors = random_vectors(500)
+    ids = np.arange(500, dtype=np.int64)
+    index = PartitionedIndex(vectors, ids, partitions=8, probes=8)
+    exact = BruteForceIndex()
+    exact.upsert(ids, vectors)
+    query = random_vectors(1, seed=2)[0]
+    weights = np.ones(DIMENSIONS, dtype=np.float32)
+
+    assert index.search(query, weights, 5)[0].tolist() == exact.search(query, weights, 5)[0].tolist()
+
+
+def test_partitioned_index_moves_and_removes_histories():
+    vectors = random_vectors(200)
+    ids = np.arange(200, dtype=np.int64)
+    index = PartitionedIndex(vectors, ids, partitions=4, probes=4)
+    weights = np.ones(DIMENSIONS, dtype=np.float32)
+
+    index.upsert(np.array([7]), vectors[150:151])
+    assert len(index) == 200
+    assert set(index.search(vectors[150], weights, 2)[0].tolist()) == {7, 150}
+
+    assert index.remove(7)
+    assert not index.remove(7)
+    assert len(index) == 199
+    assert 7 not in index.search(vectors[150], weights, 10)[0].tolist()
+
+
+ROWS = [
+    {"id": 1, "stage_at_diagnosis": "I", "tumor_aggressiveness": "Low", "edited": "2024-01-01"},
+    {"id": 2, "stage_at_diagnosis": "IV", "tumor_aggressiveness": "High", "edited": "2024-01-02"},
+    {"id": 3, "stage_at_diagnosis": "IV", "tumor_aggressiveness": "Medium", "edited": "2024-01-03"},
+]
+
+
+@pytest.fixture
+def database(monkeypatch):
+    table = {row["id"]: dict(row, document_id=f"doc-{row['id']}", recurrence="No") for row in ROWS}
+    service = similarity_service.ClinicalHistoryService
+
+    def scan(columns, after_id, limit, edited_since=None):
+        rows = [row for key, row in sorted(table.items()) if key > after_id]
+        if edited_since is not None:
+            rows = [row for row in rows if row["edited"] >= edited_since]
+        return rows[:limit]
+
+    def by_ids(ids, columns="*"):
+        return [{column: table[i].get(column) for column in columns.split(",")} for i in ids if i in table]
+
+    monkeypatch.setattr(service, "scan_clinical_histories", scan)
+    monkeypatch.setattr(service, "get_clinical_histories_by_ids", by_ids)
+    return table
+
+
+def test_search_before_first_build_starts_background_thread(monkeypatch):
+    index = SimilarityIndex()
+    started = []
+    monkeypatch.setattr(index, "start", lambda: started.append(True))
+    with pytest.raises(IndexWarmingUpError):
+        index.search({"stage_at_diagnosis": "IV"}, 2)
+    assert started == [True]
+
+
+def test_search_returns_outcomes_for_nearest_histories(database):
+    index = SimilarityIndex()
+    index.refresh()
+    matches = index.search({"stage_at_diagnosis": "IV", "tumor_aggressiveness": "High"}, 2)
+    assert [match["id"] for match in matches] == [2, 3]
+    assert matches[0] == {"id": 2, "document_id": "doc-2", "recurrence": "No", "time_to_recurrence": None,
+                          "treatment_recommendation": None, "distance": 0.0}
+
+    assert [m["id"] for m in index.search(ROWS[1], 2, exclude_id=2)] == [3, 1]
+
+
+def test_upsert_and_remove_keep_the_index_current(database):
+    index = SimilarityIndex()
+    index.refresh()
+    new = {"id": 4, "stage_at_diagnosis": "I", "tumor_aggressiveness": "High", "edited": "2024-01-04"}
+    database[4] = dict(new, document_id="doc-4")
+    index.upsert_rows([new])
+    assert index.search({"stage_at_diagnosis": "I", "tumor_aggressiveness": "High"}, 1)[0]["id"] == 4
+
+    index.remove(4)
+    assert len(index) == 3
+    assert 4 not in [m["id"] for m in index.search({"stage_at_diagnosis": "I", "tumor_aggressiveness": "High"}, 5)]
+
+
+def test_histories_deleted_elsewhere_are_dropped_from_results(database):
+    index = SimilarityIndex()
+    index.refresh()
+    del database[2]
+    assert [m["id"] for m in index.search({"stage_at_diagnosis": "IV", "tumor_aggressiveness": "High"}, 2)] == [3]
+
+
+def test_sync_picks_up_rows_edited_by_other_workers(database):
+    index = SimilarityIndex()
+    index.refresh()
+    database[5] = {"id": 5, "document_id": "doc-5", "stage_at_diagnosis": "II", "tumor_aggressiveness": "Medium",
+                   "edited": "2024-02-01"}
+    index.refresh()
+    assert len(index) == 4
+    assert index.search({"stage_at_diagnosis": "II", "tumor_aggressiveness": "Medium"}, 1)[0]["id"] == 5
+
+
+def test_removal_during_rebuild_is_applied_to_new_index(database, monkeypatch):
+    index = SimilarityIndex()
+    scan = index._scan
+
+    def scan_then_delete(edited_since=None):
+        for rows in scan(edited_since):
+            yield rows
+            index.remove(1)
+
+    monkeypatch.setattr(index, "_scan", scan_then_delete)
+    index.rebuild()
+    assert len(index) == 2
+
+
+class BrokenIndex:
+    def upsert_rows(self, rows):
+        raise RuntimeError("index broken")
+
+    def remove(self, history_id):
+        raise RuntimeError("index broken")
+
+
+@pytest.fixture
+def api(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from app.core.security import require_token
+    from app.routers import clinical_history
+
+    app = FastAPI()
+    app.include_router(clinical_history.router)
+    app.dependency_overrides[require_token] = lambda: {}
+    service = clinical_history.ClinicalHistoryService
+    monkeypatch.setattr(service, "create_clinical_history", lambda history: {
+        "id": 9, "created": "2024-01-01T00:00:00", "edited": "2024-01-01T00:00:00", **history.model_dump(mode="json")
+    })
+    monkeypatch.setattr(service, "delete_clinical_history", lambda history_id: True)
+    monkeypatch.setattr(clinical_history, "_similarity_index", BrokenIndex())
+    monkeypatch.setattr(clinical_history, "SIMILARITY_ENABLED", True)
+    return TestClient(app)
+
+
+def test_index_failure_does_not_fail_committed_writes(api):
+    from app.schemas.clinical_history import ClinicalHistoryCreate
+
+    response = api.post("/clinical_histories/", json=ClinicalHistoryCreate.Config.json_schema_extra["example"])
+    assert response.status_code == 201, response.text
+    assert response.json()["id"] == 9
+    assert api.delete("/clinical_histories/9").status_code == 204
+
+
+def test_sync_rereads_an_overlap_before_the_watermark(database, monkeypatch):
+    monkeypatch.setattr(similarity_service, "SIMILARITY_SYNC_OVERLAP_SECONDS", 30)
+    index = SimilarityIndex()
+    database[1]["edited"] = "2024-01-03T12:00:00.000000+00:00"
+    index.refresh()
+    # Transacción de otro worker que empezó antes de la marca y se confirmó después
+    database[6] = {"id": 6, "document_id": "doc-6", "stage_at_diagnosis": "III", "tumor_aggressiveness": "Low",
+                   "edited": "2024-01-03T11:59:45.000000+00:00"}
+    index.refresh()
+    assert len(index) == 4
+    assert index._sync_since(None) is None
+    assert index._sync_since("not a date") == "not a date"